@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+认证流程基准测试脚本
+在临时数据库中预置用户、邀请码和密码数据，分别通过Flask测试客户端（不含网络开销）
+和真实HTTP请求（本地werkzeug服务器）以指定并发压测以下接口：
+    salt          POST /api/auth/salt
+    login         POST /api/auth/master-password
+    verify-token  GET  /api/auth/verify-token
+    passwords     GET  /api/passwords/
+结果以JSON输出吞吐量和p50/p95/p99延迟，可用于对比token_required、JWTUtil等改动前后的性能
+
+用法示例：
+    python benchmark_auth.py --concurrency 1,8 --requests 2000 --output result.json
+"""
+
+import sys
+import os
+import json
+import math
+import time
+import hashlib
+import tempfile
+import argparse
+import threading
+import contextlib
+import socket
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+SCENARIOS = ('salt', 'login', 'verify-token', 'passwords')
+TRANSPORTS = ('client', 'http')
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='KeyGuard认证流程基准测试')
+    parser.add_argument('--users', type=int, default=50, help='预置的用户数')
+    parser.add_argument('--passwords', type=int, default=20, help='每个用户预置的密码条数')
+    parser.add_argument('--requests', type=int, default=2000, help='每个场景、每种并发下的请求数')
+    parser.add_argument('--warmup', type=int, default=50, help='每个场景正式计时前的预热请求数')
+    parser.add_argument('--concurrency', default='1,8', help='并发线程数，多个值用逗号分隔')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='压测的场景，多个值用逗号分隔')
+    parser.add_argument('--transports', default=','.join(TRANSPORTS), help='client（测试客户端）和/或http（真实HTTP）')
+    parser.add_argument('--rate-limit', action='store_true', help='保持认证接口限流开启（默认关闭，否则压测请求会被限流）')
+    parser.add_argument('--output', help='结果JSON文件路径，默认输出到标准输出')
+    args = parser.parse_args()
+
+    args.concurrency = [int(c) for c in args.concurrency.split(',') if c]
+    args.scenarios = [s for s in args.scenarios.split(',') if s]
+    args.transports = [t for t in args.transports.split(',') if t]
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f'未知场景: {scenario}，可选: {", ".join(SCENARIOS)}')
+    for transport in args.transports:
+        if transport not in TRANSPORTS:
+            parser.error(f'未知方式: {transport}，可选: {", ".join(TRANSPORTS)}')
+    return args
+
+
+def configure(args):
+    """导入应用之前，把数据目录、数据库、日志、JWT密钥等路径指向临时目录"""
+    from config.config import config
+    import logging
+
+    work_dir = tempfile.mkdtemp(prefix='keyguard-bench-')
+    for cfg in set(config.values()):
+        cfg.DATA_DIR = work_dir
+        cfg.DB_PATH = os.path.join(work_dir, 'bench.db')
+        cfg.LOG_DIR = work_dir
+        cfg.LOG_FILE = os.path.join(work_dir, 'keyguard.log')
+        cfg.LOG_LEVEL = logging.ERROR
+        cfg.RATE_LIMIT_DB_PATH = os.path.join(work_dir, 'rate_limit.db')
+        cfg.RATE_LIMIT_ENABLED = args.rate_limit
+        cfg.JWT_KEY_DIR = os.path.join(work_dir, 'jwt_keys')
+
+    # RS256/EdDSA模式下使用临时生成的签名密钥，不读写真实的密钥目录
+    current_config = config[os.getenv('FLASK_ENV', 'default')]
+    from utils.jwt_keys import ASYMMETRIC_ALGORITHMS, generate_key_pair
+    if current_config.JWT_ALGORITHM in ASYMMETRIC_ALGORITHMS:
+        generate_key_pair(current_config.JWT_KEY_DIR, current_config.JWT_ALGORITHM, activate=True)
+    return work_dir
+
+
+def log(message):
+    """进度信息输出到标准错误，标准输出只留给结果JSON"""
+    print(message, file=sys.stderr, flush=True)
+
+
+def seed(num_users, num_passwords):
+    """预置用户、邀请码和密码数据
+
+    Returns:
+        list[dict]: 用户信息，包含inviteCode、derivedHash和模拟的客户端IP
+    """
+    from models.user import User
+    from models.invite_code import InviteCode
+    from models.password import Password
+    from utils.db import Database
+
+    users = []
+    for i in range(num_users):
+        invite_code = f'bench{i:05d}'
+        derived_hash = hashlib.sha256(invite_code.encode('utf-8')).hexdigest()
+        InviteCode.create(code=invite_code)
+        user_id = User.create(f'bench_user_{i}', derived_hash, invite_code, User.generate_salt())
+        if user_id is None:
+            raise RuntimeError(f'创建用户{i}失败')
+        InviteCode.mark_as_used(invite_code)
+
+        with Database.transaction():
+            for j in range(num_passwords):
+                Password.save({
+                    'id': f'{user_id}-{j}',
+                    'userId': user_id,
+                    'title': f'站点{j}',
+                    'username': f'user{j}@example.com',
+                    'password': 'encrypted-' + hashlib.sha256(f'{i}-{j}'.encode('utf-8')).hexdigest(),
+                    'url': f'https://site{j}.example.com',
+                    'category': f'分类{j % 5}'
+                })
+
+        users.append({
+            'inviteCode': invite_code,
+            'derivedHash': derived_hash,
+            # 测试客户端模式下每个用户使用不同的IP，令牌与IP绑定
+            'ip': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}'
+        })
+    return users
+
+
+class ClientTransport:
+    """Flask测试客户端，测量不含网络和HTTP解析的应用开销"""
+
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None, ip=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.open(path, method=method, json=body, headers=headers,
+                               environ_base={'REMOTE_ADDR': ip or '127.0.0.1'})
+        data = response.get_data()
+        return response.status_code, data
+
+    def close(self):
+        pass
+
+
+class HttpTransport:
+    """真实HTTP请求，服务端为本地多线程werkzeug服务器，客户端每个线程一个长连接"""
+
+    name = 'http'
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server, WSGIRequestHandler
+
+        class KeepAliveHandler(WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # 响应头和响应体分开写出，不关闭Nagle算法时每个请求会多出约40ms的延迟确认等待
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+        self.port = self.server.server_port
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None, ip=None):
+        # 所有请求都来自127.0.0.1，ip参数不起作用
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            conn.connect()
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            # 连接被服务端关闭时重新建立
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def close(self):
+        self.server.shutdown()
+
+
+def login_all(transport, users):
+    """为每个用户登录一次，取得该方式下可用的访问令牌"""
+    tokens = []
+    for user in users:
+        status, data = transport.request('POST', '/api/auth/master-password', {
+            'inviteCode': user['inviteCode'], 'derivedHash': user['derivedHash']
+        }, ip=user['ip'])
+        if status != 200:
+            raise RuntimeError(f'登录失败: {status} {data[:200]!r}')
+        tokens.append(json.loads(data)['token'])
+    return tokens
+
+
+def make_request(scenario, users, tokens):
+    """返回执行第n个请求的函数"""
+    def run(transport, n):
+        index = n % len(users)
+        user = users[index]
+        if scenario == 'salt':
+            return transport.request('POST', '/api/auth/salt', {'inviteCode': user['inviteCode']}, ip=user['ip'])
+        if scenario == 'login':
+            return transport.request('POST', '/api/auth/master-password', {
+                'inviteCode': user['inviteCode'], 'derivedHash': user['derivedHash']
+            }, ip=user['ip'])
+        if scenario == 'verify-token':
+            return transport.request('GET', '/api/auth/verify-token', token=tokens[index], ip=user['ip'])
+        return transport.request('GET', '/api/passwords/', token=tokens[index], ip=user['ip'])
+    return run
+
+
+def percentile(sorted_values, p):
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values), max(1, math.ceil(p / 100 * len(sorted_values)))) - 1
+    return sorted_values[rank]
+
+
+def run_scenario(transport, scenario, run, concurrency, num_requests, warmup):
+    """以指定并发执行num_requests个请求，返回统计结果"""
+    for n in range(warmup):
+        run(transport, n)
+
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    counter = iter(range(num_requests))
+
+    def worker():
+        local_latencies = []
+        local_errors = {}
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                break
+            start = time.perf_counter()
+            try:
+                status, _ = run(transport, n)
+            except Exception as e:
+                status = type(e).__name__
+            local_latencies.append(time.perf_counter() - start)
+            if status != 200:
+                local_errors[str(status)] = local_errors.get(str(status), 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for key, count in local_errors.items():
+                errors[key] = errors.get(key, 0) + count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    to_ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        'scenario': scenario,
+        'transport': transport.name,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'durationSeconds': round(elapsed, 3),
+        'throughputRps': round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        'latencyMs': {
+            'mean': to_ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': to_ms(percentile(latencies, 50)),
+            'p95': to_ms(percentile(latencies, 95)),
+            'p99': to_ms(percentile(latencies, 99)),
+            'max': to_ms(latencies[-1] if latencies else None)
+        }
+    }
+
+
+def main():
+    args = parse_args()
+    work_dir = configure(args)
+
+    # 应用初始化时会向标准输出打印日志清理信息，转到标准错误
+    with contextlib.redirect_stdout(sys.stderr):
+        from app import app
+
+    log(f"预置数据: {args.users}个用户，每个用户{args.passwords}条密码（{work_dir}）")
+    seed_started = time.perf_counter()
+    users = seed(args.users, args.passwords)
+    log(f"预置完成，用时{time.perf_counter() - seed_started:.1f}秒")
+
+    results = []
+    for transport_name in args.transports:
+        transport = ClientTransport(app) if transport_name == 'client' else HttpTransport(app)
+        try:
+            tokens = login_all(transport, users)
+            for scenario in args.scenarios:
+                run = make_request(scenario, users, tokens)
+                for concurrency in args.concurrency:
+                    result = run_scenario(transport, scenario, run, concurrency, args.requests, args.warmup)
+                    log(f"{transport_name:<6} {scenario:<13} 并发{concurrency:<3} "
+                        f"{result['throughputRps']} req/s  p50 {result['latencyMs']['p50']}ms  "
+                        f"p99 {result['latencyMs']['p99']}ms  错误 {sum(result['errors'].values())}")
+                    results.append(result)
+        finally:
+            transport.close()
+
+    report = {
+        'config': {
+            'users': args.users,
+            'passwordsPerUser': args.passwords,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'rateLimit': args.rate_limit,
+            'python': sys.version.split()[0]
+        },
+        'results': results
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        log(f"结果已写入 {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
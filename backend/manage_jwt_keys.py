@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+JWT签名密钥管理脚本
+用于RS256/EdDSA模式下生成、切换、下线签名密钥，需要安装cryptography
+
+轮换步骤：
+1. 在签发节点生成新密钥（不立即启用）
+2. 把新公钥（<kid>.pub.pem）复制到所有验证节点的密钥目录
+3. 在签发节点启用新密钥
+4. 下线旧私钥；等待一个访问令牌有效期后，在所有节点删除旧公钥
+"""
+
+import sys
+import os
+import datetime
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from config.config import config
+from utils.jwt_keys import (
+    ASYMMETRIC_ALGORITHMS, PRIVATE_KEY_SUFFIX, PUBLIC_KEY_SUFFIX,
+    JWTKeySet, generate_key_pair, activate_key
+)
+
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+
+class JWTKeyManager:
+    """JWT签名密钥管理器"""
+
+    def __init__(self):
+        self.key_dir = current_config.JWT_KEY_DIR
+        self.algorithm = current_config.JWT_ALGORITHM
+
+    def print_menu(self):
+        """打印菜单"""
+        print("\n=== JWT签名密钥管理 ===")
+        print(f"密钥目录: {self.key_dir}")
+        print(f"签名算法: {self.algorithm}")
+        print("1. 查看密钥")
+        print("2. 生成新密钥")
+        print("3. 启用密钥（用于签名）")
+        print("4. 下线私钥")
+        print("5. 删除公钥")
+        print("6. 退出")
+        print("=" * 30)
+
+    def _path(self, kid, suffix):
+        return os.path.join(self.key_dir, kid + suffix)
+
+    def _active_kid(self):
+        key_set = JWTKeySet(self.key_dir, self.algorithm)
+        try:
+            return key_set.signing_key()[0]
+        except RuntimeError:
+            return None
+
+    def list_keys(self):
+        """查看密钥"""
+        kids = JWTKeySet(self.key_dir, self.algorithm).kids()
+        if not kids:
+            print("⚠️  没有找到密钥")
+            return
+
+        active_kid = self._active_kid()
+        print(f"\n找到 {len(kids)} 个密钥:")
+        print("=" * 80)
+        print(f"{'kid':<25} {'私钥':<8} {'签名中':<8} {'公钥修改时间':<25}")
+        print("=" * 80)
+        for kid in kids:
+            has_private = os.path.exists(self._path(kid, PRIVATE_KEY_SUFFIX))
+            mtime = datetime.datetime.fromtimestamp(os.path.getmtime(self._path(kid, PUBLIC_KEY_SUFFIX)))
+            print(f"{kid:<25} {'有' if has_private else '无':<8} {'是' if kid == active_kid else '':<8} "
+                  f"{mtime.strftime('%Y-%m-%d %H:%M:%S'):<25}")
+        print("=" * 80)
+
+    def generate_key(self):
+        """生成新密钥"""
+        first_key = self._active_kid() is None
+        activate = first_key or input("是否立即用于签名？验证节点尚未拿到公钥时请选n (y/N): ").strip().lower() == 'y'
+        kid = generate_key_pair(self.key_dir, self.algorithm, activate=activate)
+        print(f"✅ 密钥已生成: {kid}")
+        if activate:
+            print("✅ 已启用为签名密钥")
+        else:
+            print(f"请把 {kid}{PUBLIC_KEY_SUFFIX} 复制到所有验证节点后再启用")
+
+    def activate(self):
+        """启用密钥"""
+        kid = input("输入要启用的kid: ").strip()
+        try:
+            activate_key(self.key_dir, kid)
+            print(f"✅ 密钥 {kid} 已启用，签发节点最迟在{current_config.JWT_KEY_RELOAD_INTERVAL:g}秒后使用")
+        except ValueError:
+            print(f"❌ 私钥 {kid} 不存在")
+
+    def retire_private_key(self):
+        """下线私钥"""
+        kid = input("输入要下线的kid: ").strip()
+        if kid == self._active_kid():
+            print("❌ 该密钥正在用于签名，请先启用其他密钥")
+            return
+        path = self._path(kid, PRIVATE_KEY_SUFFIX)
+        if not os.path.exists(path):
+            print(f"❌ 私钥 {kid} 不存在")
+            return
+        os.remove(path)
+        print(f"✅ 私钥 {kid} 已删除，公钥保留用于验证已签发的令牌")
+        print(f"请在{current_config.ACCESS_TOKEN_EXPIRE_MINUTES}分钟后再删除其公钥")
+
+    def delete_public_key(self):
+        """删除公钥"""
+        kid = input("输入要删除公钥的kid: ").strip()
+        if os.path.exists(self._path(kid, PRIVATE_KEY_SUFFIX)):
+            print("❌ 该密钥的私钥仍然存在，请先下线私钥")
+            return
+        path = self._path(kid, PUBLIC_KEY_SUFFIX)
+        if not os.path.exists(path):
+            print(f"❌ 公钥 {kid} 不存在")
+            return
+        confirm = input("用该密钥签发的令牌将立即失效，确认删除？(y/N): ").strip().lower()
+        if confirm != 'y':
+            return
+        os.remove(path)
+        print(f"✅ 公钥 {kid} 已删除")
+
+    def run(self):
+        """运行管理工具"""
+        if self.algorithm not in ASYMMETRIC_ALGORITHMS:
+            print(f"⚠️  当前签名算法为{self.algorithm}，请先设置环境变量JWT_ALGORITHM为RS256或EdDSA")
+            return
+
+        while True:
+            self.print_menu()
+            choice = input("请选择操作 (1-6): ").strip()
+
+            if choice == '1':
+                self.list_keys()
+            elif choice == '2':
+                self.generate_key()
+            elif choice == '3':
+                self.activate()
+            elif choice == '4':
+                self.retire_private_key()
+            elif choice == '5':
+                self.delete_public_key()
+            elif choice == '6':
+                break
+            else:
+                print("❌ 无效的选择，请输入1-6之间的数字")
+
+            # 按任意键继续
+            input("\n按回车键继续...")
+
+if __name__ == "__main__":
+    manager = JWTKeyManager()
+    manager.run()
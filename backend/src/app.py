@@ -19,6 +19,8 @@ from utils.db import Database
 from utils.log import Logger
 from routes.password_routes import password_bp
 from routes.auth_routes import auth_bp
+from middleware.compression import init_compression
+from utils.jwt import validate_jwt_config
 
 # 初始化日志
 logger = Logger.get_logger('app')
@@ -49,6 +51,10 @@ allowed_origins = [
 CORS(app, origins=allowed_origins, supports_credentials=True)
 logger.info("CORS配置完成，仅允许本地网络和前端服务器请求")
 
+# 校验令牌签名配置，配置错误时拒绝启动
+validate_jwt_config()
+logger.info(f"JWT签名算法: {current_config.JWT_ALGORITHM}")
+
 # 初始化数据库
 logger.info("开始初始化数据库...")
 Database.init_db()
@@ -60,6 +66,10 @@ app.register_blueprint(password_bp)
 app.register_blueprint(auth_bp)
 logger.info("蓝图注册完成")
 
+# 响应压缩，对API接口和静态文件统一生效
+init_compression(app)
+logger.info("响应压缩配置完成")
+
 # 健康检查端点
 @app.route('/health')
 def health_check():
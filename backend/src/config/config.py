@@ -11,6 +11,85 @@ class Config:
     DATA_DIR = os.path.join(os.path.dirname(BASE_DIR), 'data')
     DB_PATH = os.path.join(DATA_DIR, 'key_guard.db')
     
+    # 数据库连接池配置
+    DB_POOL_SIZE = 5  # 连接池中保留的空闲连接数
+    DB_POOL_MAX_OVERFLOW = 10  # 高峰期允许额外创建的临时连接数
+    DB_POOL_TIMEOUT = 5.0  # 获取连接的最长等待时间（秒）
+    DB_POOL_HEALTH_CHECK_INTERVAL = 30.0  # 连接空闲超过该时间（秒）后，取出时先做健康检查
+    DB_JOURNAL_MODE = 'WAL'  # 日志模式，WAL模式下读写互不阻塞；设为None保持SQLite默认值
+    
+    # 单写线程写入队列配置（开启后，写语句和写事务统一交给写线程按批次合并提交）
+    DB_WRITE_QUEUE_ENABLED = False
+    DB_WRITE_QUEUE_MAX_BATCH = 64  # 每次合并提交的最大写请求数
+    DB_WRITE_QUEUE_MAX_DELAY = 0.002  # 收集同一批次写请求的最长等待时间（秒）
+    DB_WRITE_QUEUE_MAX_SIZE = 10000  # 队列中最多等待的写请求数，队列满时提交方等待
+    DB_WRITE_QUEUE_TIMEOUT = 30.0  # 写请求排队等待的最长时间（秒），超时未开始执行的请求会被取消
+    DB_WRITE_QUEUE_RETRY_AFTER_SECONDS = 1  # 写入队列已满或等待超时时返回503，建议客户端重试的间隔（秒）
+    
+    # SQL执行统计配置
+    DB_QUERY_STATS_ENABLED = True  # 是否按语句记录耗时直方图和行数
+    DB_SLOW_QUERY_MS = 100  # 慢查询阈值（毫秒），超过时输出警告日志并记录执行计划
+    DB_SLOW_QUERY_EXPLAIN = True  # 慢查询是否记录EXPLAIN QUERY PLAN
+    DB_SLOW_QUERY_LOG_SIZE = 100  # 内存中保留的最近慢查询条数
+    
+    # 批量接口配置
+    PASSWORD_BATCH_MAX_OPERATIONS = 5000  # POST /api/passwords/batch 单次请求允许的最大操作数
+    
+    # 分页配置
+    PASSWORD_PAGE_DEFAULT_LIMIT = 100  # GET /api/passwords 只传after时的默认每页条数
+    PASSWORD_PAGE_MAX_LIMIT = 500  # 每页最大条数
+    
+    # 搜索配置
+    PASSWORD_SEARCH_DEFAULT_LIMIT = 50  # 搜索接口默认返回条数
+    PASSWORD_SEARCH_MAX_LIMIT = 200  # 搜索接口单次最多返回条数
+    PASSWORD_SEARCH_MAX_TERMS = 8  # 搜索关键词最多分词个数，超出部分忽略
+    
+    # 导入导出、分类统计配置
+    PASSWORD_EXPORT_FETCH_SIZE = 500  # 导出时每次从游标读取的行数
+    PASSWORD_IMPORT_CHUNK_SIZE = 500  # 导入时每个事务提交的记录数
+    PASSWORD_IMPORT_MAX_LINE_BYTES = 1024 * 1024  # 导入时单行NDJSON的最大字节数
+    PASSWORD_IMPORT_MAX_ERRORS = 100  # 导入结果中最多返回的错误明细条数
+    PASSWORD_CATEGORY_CACHE_SIZE = 1024  # 分类统计缓存的用户数，按密码库修订号判断是否失效
+    
+    # 认证配置
+    AUTH_TOKEN_CACHE_SIZE = 4096  # 已验证令牌的缓存条数，0表示不缓存，条目在令牌过期时失效
+    ACCESS_TOKEN_EXPIRE_MINUTES = 30  # 访问令牌（JWT）有效期（分钟）
+    REFRESH_TOKEN_EXPIRE_DAYS = 14  # 刷新令牌有效期（天），每次刷新后重新计算，连续未使用超过该时长需重新登录
+    REFRESH_TOKEN_MAX_LIFETIME_DAYS = 90  # 一次登录最长可以通过刷新维持的时长（天），到期后必须重新输入主密码
+    TOKEN_REVOCATION_SYNC_INTERVAL = 1.0  # 从数据库同步令牌撤销记录的间隔（秒），即其他进程的撤销最迟多久生效
+    AUTH_SALT_CACHE_SIZE = 4096  # 邀请码到盐值的缓存条数，0表示不缓存
+    AUTH_SALT_CACHE_TTL = 300  # 盐值缓存的有效期（秒），多进程部署时其他进程修改主密码后最迟多久生效
+    AUTH_SALT_NEGATIVE_TTL = 30  # 未知邀请码的缓存有效期（秒）
+    JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')  # 访问令牌签名算法：HS256（共享SECRET_KEY）、RS256或EdDSA（私钥签名、公钥验证，需要安装cryptography），其他值启动时报错
+    JWT_KEY_DIR = os.getenv('JWT_KEY_DIR', os.path.join(DATA_DIR, 'jwt_keys'))  # RS256/EdDSA模式的密钥目录，验证节点只需要其中的公钥
+    JWT_KEY_RELOAD_INTERVAL = 60.0  # 重新扫描密钥目录的间隔（秒），轮换密钥无需重启
+    
+    # 限流配置（登录、获取盐值、创建主密码等未认证接口）
+    RATE_LIMIT_ENABLED = True  # 是否对未认证的认证接口限流
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # memory（进程内）或sqlite（多进程部署时共享限流状态）
+    RATE_LIMIT_DB_PATH = os.path.join(DATA_DIR, 'rate_limit.db')  # sqlite后端的状态文件，与业务数据库分开，不争用写锁
+    RATE_LIMIT_IP_RATE = 1.0  # 每个IP每秒补充的请求数
+    RATE_LIMIT_IP_BURST = 20  # 每个IP允许的突发请求数
+    RATE_LIMIT_INVITE_RATE = 0.2  # 每个邀请码每秒补充的请求数（每5秒一次）
+    RATE_LIMIT_INVITE_BURST = 10  # 每个邀请码允许的突发请求数
+    RATE_LIMIT_MAX_KEYS = 100000  # memory后端最多记录的IP/邀请码数，超出时淘汰最久未访问的
+    
+    # 密钥派生（PBKDF2）配置
+    KDF_DEFAULT_ITERATIONS = 10000  # 未指定迭代次数时使用的PBKDF2迭代次数，必须与前端encryption.ts中的ITERATIONS一致
+    KDF_POOL_WORKERS = 2  # 同时进行密钥派生计算的线程数
+    KDF_POOL_MAX_PENDING = 8  # 最多容纳的密钥派生任务数（计算中 + 排队中），超出时返回503
+    KDF_POOL_TIMEOUT = 10.0  # 等待单次密钥派生结果的最长时间（秒）
+    KDF_RETRY_AFTER_SECONDS = 1  # 返回503时建议客户端重试的间隔（秒）
+    
+    # 响应压缩配置
+    COMPRESSION_ENABLED = True  # 是否按Accept-Encoding压缩响应
+    COMPRESSION_LEVEL = 6  # 压缩级别（1-9），越高压缩率越高、CPU开销越大
+    COMPRESSION_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+    COMPRESSION_MIMETYPES = (  # 需要压缩的响应类型
+        'application/json', 'application/x-ndjson', 'application/javascript',
+        'text/html', 'text/css', 'text/javascript', 'text/plain', 'image/svg+xml'
+    )
+    
     # 日志配置
     LOG_DIR = os.path.join(os.path.dirname(BASE_DIR), 'logs')
     LOG_LEVEL = logging.INFO
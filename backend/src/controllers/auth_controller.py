@@ -1,11 +1,22 @@
+import os
 from flask import jsonify, request
 from models.user import User
+from models.refresh_token import RefreshToken, RefreshTokenError, RefreshTokenReuseError
+from models.token_revocation import TokenRevocation
+from middleware.auth_middleware import invalidate_token, clear_token_cache
 from utils.jwt import JWTUtil
+from utils.kdf_pool import KdfPoolBusyError
+from utils.db import Database
+from utils.write_queue import WriteQueueBusyError
+from config.config import config
 from utils.log import Logger
 
 # 初始化日志
 logger = Logger.get_logger('auth_controller')
 
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
 class AuthController:
     @staticmethod
     def authenticate_master_password():
@@ -24,28 +35,22 @@ class AuthController:
             logger.info(f"认证请求 - IP地址: {ip_address}")
             
             # 1. 首先尝试根据password_hash和invite_code查找用户（登录场景）
-            query = 'SELECT * FROM users WHERE password_hash = ? AND invite_code = ?'
-            from utils.db import Database
-            rows = Database.execute_query(query, (derived_hash, invite_code))
-            
-            if rows:
-                # 找到匹配的用户，直接从行数据创建User对象，避免重复查询
-                row = rows[0]
-                user = User(
-                    id=row['id'],
-                    username=row['username'],
-                    password_hash=row['password_hash'],
-                    salt=row['salt'],
-                    invite_code=row['invite_code'],
-                    created_at=row['created_at'],
-                    updated_at=row['updated_at']
-                )
+            user = User.get_by_credentials(derived_hash, invite_code)
+            
+            if user:
                 logger.info(f"用户{user.username}主密码验证成功")
                 
                 # 生成JWT令牌
                 token = JWTUtil.generate_token(user.id, user.username, ip_address=ip_address)
+                refresh_token = RefreshToken.issue(user.id, ip_address)
                 logger.info(f"用户{user.username}认证成功，生成JWT令牌")
-                return jsonify({'success': True, 'token': token, 'user': user.to_dict()}), 200
+                return jsonify({
+                    'success': True,
+                    'token': token,
+                    'refreshToken': refresh_token,
+                    'expiresIn': current_config.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+                    'user': user.to_dict()
+                }), 200
             else:
                 # 2. 登录失败，尝试使用邀请码创建新用户
                 logger.info(f"登录失败，尝试使用邀请码{invite_code}创建新用户")
@@ -53,47 +58,136 @@ class AuthController:
                 # 导入InviteCode模型
                 from models.invite_code import InviteCode
                 
-                # 验证邀请码是否存在且未使用
-                invite_code_obj = InviteCode.get_by_code(invite_code)
-                if not invite_code_obj:
-                    logger.warning(f"邀请码{invite_code}不存在")
-                    return jsonify({'success': False, 'error': 'Invite code does not exist'}), 400
-                
-                if not invite_code_obj.is_valid():
-                    logger.warning(f"邀请码{invite_code}无效或已过期")
-                    return jsonify({'success': False, 'error': 'Invite code invalid or expired'}), 400
-                
-                # 3. 从请求中获取盐值
-                if 'salt' not in data:
-                    logger.warning("盐值缺失")
-                    return jsonify({'error': 'Missing salt'}), 400
-                
-                salt = data['salt']
-                
-                # 4. 创建用户
-                username = 'user'
-                
-                # 创建用户
-                user_id = User.create(username, derived_hash, invite_code, salt)
-                
-                if user_id:
-                    # 5. 将邀请码标记为已使用
-                    InviteCode.mark_as_used(invite_code)
+                # 校验邀请码、创建用户和标记邀请码在同一事务中完成，一次提交，
+                # 同时持有写锁，避免同一邀请码被并发注册两次
+                with Database.transaction():
+                    # 验证邀请码是否存在且未使用
+                    invite_code_obj = InviteCode.get_by_code(invite_code)
+                    if not invite_code_obj:
+                        logger.warning(f"邀请码{invite_code}不存在")
+                        return jsonify({'success': False, 'error': 'Invite code does not exist'}), 400
+                    
+                    if not invite_code_obj.is_valid():
+                        logger.warning(f"邀请码{invite_code}无效或已过期")
+                        return jsonify({'success': False, 'error': 'Invite code invalid or expired'}), 400
+                    
+                    # 3. 从请求中获取盐值
+                    if 'salt' not in data:
+                        logger.warning("盐值缺失")
+                        return jsonify({'error': 'Missing salt'}), 400
+                    
+                    salt = data['salt']
                     
+                    # 4. 创建用户
+                    username = 'user'
+                    
+                    # 创建用户
+                    user_id = User.create(username, derived_hash, invite_code, salt)
+                    
+                    if user_id:
+                        # 5. 将邀请码标记为已使用
+                        InviteCode.mark_as_used(invite_code)
+                    
+                if user_id:
                     logger.info("主密码创建成功")
                     # 生成JWT令牌
                     token = JWTUtil.generate_token(user_id, username, ip_address=ip_address)
+                    refresh_token = RefreshToken.issue(user_id, ip_address)
                     logger.info("生成JWT令牌")
-                    return jsonify({'success': True, 'token': token}), 200
+                    return jsonify({
+                        'success': True,
+                        'token': token,
+                        'refreshToken': refresh_token,
+                        'expiresIn': current_config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+                    }), 200
                 else:
                     logger.error("主密码创建失败")
                     return jsonify({'success': False, 'error': 'Failed to create master password'}), 500
                 
+        except WriteQueueBusyError:
+            # 数据库写入队列繁忙，让客户端稍后重试
+            logger.warning("认证失败: 数据库写入队列繁忙")
+            response = jsonify({'error': 'Server busy, please retry later'})
+            response.headers['Retry-After'] = str(current_config.DB_WRITE_QUEUE_RETRY_AFTER_SECONDS)
+            return response, 503
         except Exception as e:
             logger.exception(f"认证过程发生错误: {str(e)}")
             return jsonify({'error': str(e)}), 500
     
     
+    @staticmethod
+    def refresh_token():
+        """使用刷新令牌换取新的访问令牌和刷新令牌，无需重新输入主密码
+        
+        旧的刷新令牌随即作废；已作废的刷新令牌再次被使用时，视为令牌泄露，
+        撤销该次登录的所有刷新令牌
+        """
+        try:
+            data = request.json
+            refresh_token = data.get('refreshToken') if isinstance(data, dict) else None
+            if not refresh_token or not isinstance(refresh_token, str):
+                logger.warning("刷新令牌缺失")
+                return jsonify({'error': 'Missing refresh token'}), 400
+            
+            ip_address = request.remote_addr
+            try:
+                user_id, new_refresh_token = RefreshToken.rotate(refresh_token, ip_address)
+            except RefreshTokenReuseError as e:
+                logger.warning(f"检测到刷新令牌重用，已撤销该会话 - IP地址: {ip_address}")
+                return jsonify({'error': str(e)}), 401
+            except RefreshTokenError as e:
+                logger.warning(f"刷新令牌无效: {str(e)}")
+                return jsonify({'error': str(e)}), 401
+            
+            user = User.get_by_id(user_id)
+            if not user:
+                logger.warning(f"刷新令牌对应的用户不存在: {user_id}")
+                return jsonify({'error': 'User not found'}), 401
+            
+            token = JWTUtil.generate_token(user.id, user.username, ip_address=ip_address)
+            logger.info(f"用户{user.username}刷新令牌成功")
+            return jsonify({
+                'success': True,
+                'token': token,
+                'refreshToken': new_refresh_token,
+                'expiresIn': current_config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            }), 200
+        except WriteQueueBusyError:
+            # 数据库写入队列繁忙，让客户端稍后重试
+            logger.warning("刷新令牌失败: 数据库写入队列繁忙")
+            response = jsonify({'error': 'Server busy, please retry later'})
+            response.headers['Retry-After'] = str(current_config.DB_WRITE_QUEUE_RETRY_AFTER_SECONDS)
+            return response, 503
+        except Exception as e:
+            logger.exception(f"刷新令牌过程发生错误: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @staticmethod
+    def logout():
+        """退出登录：撤销当前访问令牌，请求体中带有refreshToken时一并撤销该次登录的刷新令牌"""
+        try:
+            claims = request.token_claims
+            if claims.get('jti'):
+                TokenRevocation.revoke_token(claims['jti'], claims['user_id'], claims['exp'])
+            invalidate_token(request.token)
+            
+            data = request.get_json(silent=True)
+            refresh_token = data.get('refreshToken') if isinstance(data, dict) else None
+            if refresh_token and isinstance(refresh_token, str):
+                RefreshToken.revoke(refresh_token)
+            
+            logger.info(f"用户{request.username}退出登录")
+            return jsonify({'success': True}), 200
+        except WriteQueueBusyError:
+            # 数据库写入队列繁忙，让客户端稍后重试
+            logger.warning("退出登录失败: 数据库写入队列繁忙")
+            response = jsonify({'error': 'Server busy, please retry later'})
+            response.headers['Retry-After'] = str(current_config.DB_WRITE_QUEUE_RETRY_AFTER_SECONDS)
+            return response, 503
+        except Exception as e:
+            logger.exception(f"退出登录过程发生错误: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
     @staticmethod
     def get_salt():
         """获取用户盐值：先根据邀请码和hash获取用户的盐值，没有再生成新的盐值返回"""
@@ -121,20 +215,16 @@ class AuthController:
             
             # 如果提供了邀请码，尝试从数据库中获取用户盐值
             if invite_code:
-                query = 'SELECT salt FROM users WHERE invite_code = ?'
-                from utils.db import Database
-                result = Database.execute_query(query, (invite_code,))
+                salt = User.get_salt_by_invite_code(invite_code)
                 
-                if result and len(result) > 0:
+                if salt is not None:
                     # 找到用户，返回用户的盐值
-                    salt = result[0]['salt']
                     logger.info("找到用户，返回用户的盐值")
                     return jsonify({'success': True, 'salt': salt}), 200
                 else:
                     logger.info("未找到匹配的用户")
             
             # 如果没有提供邀请码，或者没有找到用户，生成新的盐值返回
-            from models.user import User
             salt = User.generate_salt()
             logger.info("生成随机盐值")
             return jsonify({'success': True, 'salt': salt}), 200
@@ -225,6 +315,8 @@ class AuthController:
             
             # 验证令牌
             result = JWTUtil.verify_token(token)
+            if result['valid'] and TokenRevocation.is_revoked(result['jti'], result['user_id'], result['iat']):
+                result = {'valid': False, 'error': 'Token has been revoked'}
             if result['valid']:
                 return jsonify({'success': True, 'user_id': result['user_id'], 'username': result['username']}), 200
             else:
@@ -249,6 +341,8 @@ class AuthController:
             
             # 验证令牌
             result = JWTUtil.verify_token(token)
+            if result['valid'] and TokenRevocation.is_revoked(result['jti'], result['user_id'], result['iat']):
+                result = {'valid': False, 'error': 'Token has been revoked'}
             if not result['valid']:
                 logger.warning(f"修改主密码令牌验证失败: {result['error']}")
                 return jsonify({'error': result['error']}), 401
@@ -277,12 +371,23 @@ class AuthController:
             # 更新密码
             success = User.update(user.id, password=new_password)
             if success:
-                logger.info(f"用户{user.username}主密码修改成功")
+                # 主密码已修改，此前签发的访问令牌和刷新令牌全部作废
+                TokenRevocation.revoke_user_tokens(user.id)
+                # 缓存按令牌摘要存放，无法只清除该用户的条目，修改主密码不频繁，直接清空
+                clear_token_cache()
+                RefreshToken.revoke_user(user.id)
+                logger.info(f"用户{user.username}主密码修改成功，已撤销此前签发的令牌")
                 return jsonify({'success': True}), 200
             else:
                 logger.error(f"用户{user.username}主密码修改失败")
                 return jsonify({'error': 'Failed to update password'}), 500
                 
+        except KdfPoolBusyError as e:
+            # 密钥派生线程池已满或计算超时，让客户端稍后重试，不占用请求线程排队
+            logger.warning("修改主密码请求过多，密钥派生线程池繁忙")
+            response = jsonify({'error': 'Server busy, please retry later'})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 503
         except Exception as e:
             logger.exception(f"修改主密码过程发生错误: {str(e)}")
             return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,21 +1,96 @@
-from flask import jsonify, request
-from models.password import Password
+import os
+from flask import current_app, jsonify, request
+from models.password import Password, SUMMARY_FIELDS, VersionConflictError, get_projection
 from middleware.auth_middleware import token_required
+from config.config import config
+from utils.db import Database
+from utils.write_queue import WriteQueueBusyError
+from utils.pagination import InvalidCursorError, parse_limit
+from utils.ndjson import iter_ndjson
+from utils.http_cache import make_etag, is_not_modified, not_modified_response, with_etag, get_if_match_version
+from models.vault_revision import VaultRevision
 from utils.log import Logger
 
 # 初始化日志
 logger = Logger.get_logger('password_controller')
 
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+# 批量接口支持的操作类型
+BATCH_WRITE_OPS = ('create', 'update', 'upsert')
+BATCH_DELETE_OP = 'delete'
+
 class PasswordController:
     @staticmethod
     @token_required
     def get_all_passwords():
-        """获取所有密码"""
+        """获取所有密码
+        
+        查询参数：
+            limit: 每页条数，传入limit或after时按(category, title, id)键集分页，
+                返回 {"items": [...], "nextCursor": "..."}
+            after: 上一页返回的nextCursor
+            view: summary时只返回列表视图需要的字段（id, title, username, url, category, platform），
+                完整记录通过 GET /api/passwords/<id> 获取
+            fields: 逗号分隔的字段列表，只返回这些字段（id始终返回），优先于view
+        不传分页参数时保持原有行为，返回全部密码的数组
+        
+        响应带有基于密码库修订号的ETag，If-None-Match匹配时返回304 Not Modified
+        """
         try:
-            logger.info("开始获取所有密码")
-            passwords = Password.get_all(request.user_id)
-            logger.info(f"成功获取{len(passwords)}条密码记录")
-            return jsonify(passwords), 200
+            limit_arg = request.args.get('limit')
+            after = request.args.get('after')
+            
+            fields_arg = request.args.get('fields')
+            view = request.args.get('view')
+            if fields_arg:
+                fields = [field.strip() for field in fields_arg.split(',') if field.strip()]
+            elif view == 'summary':
+                fields = SUMMARY_FIELDS
+            elif view in (None, '', 'full'):
+                fields = None
+            else:
+                logger.warning(f"无效的视图参数view: {view}")
+                return jsonify({'error': 'Invalid view'}), 400
+            
+            try:
+                get_projection(fields)
+            except ValueError as e:
+                logger.warning(f"无效的字段参数fields: {fields_arg}")
+                return jsonify({'error': str(e)}), 400
+            
+            paginated = limit_arg is not None or after is not None
+            if paginated:
+                try:
+                    limit = parse_limit(limit_arg, current_config.PASSWORD_PAGE_DEFAULT_LIMIT, current_config.PASSWORD_PAGE_MAX_LIMIT)
+                except ValueError:
+                    logger.warning(f"无效的分页参数limit: {limit_arg}")
+                    return jsonify({'error': 'Invalid limit'}), 400
+            
+            # 修订号和数据在同一个读事务中读取，保证ETag与响应内容一致
+            with Database.transaction(immediate=False):
+                etag = make_etag(request.user_id, VaultRevision.get(request.user_id), request.path, request.query_string)
+                if is_not_modified(etag):
+                    # 密码库没有变化，不查询passwords表
+                    logger.info("密码库未变化，返回304")
+                    return not_modified_response(etag)
+                
+                if not paginated:
+                    logger.info("开始获取所有密码")
+                    # 行直接序列化为JSON，不再逐行构造字典
+                    body = Password.get_all_json(request.user_id, fields)
+                    logger.info("成功获取密码记录")
+                else:
+                    logger.info(f"开始分页获取密码，每页{limit}条")
+                    try:
+                        body = Password.get_page_json(request.user_id, limit, after, fields)
+                    except InvalidCursorError:
+                        logger.warning("无效的分页游标")
+                        return jsonify({'error': 'Invalid cursor'}), 400
+            
+            response = current_app.response_class(body, mimetype='application/json')
+            return with_etag(response, etag), 200
         except Exception as e:
             logger.exception(f"获取所有密码失败: {str(e)}")
             return jsonify({'error': str(e)}), 500
@@ -23,23 +98,217 @@ class PasswordController:
     @staticmethod
     @token_required
     def get_password_by_id(password_id):
-        """根据ID获取密码"""
+        """根据ID获取密码，支持ETag / If-None-Match条件请求"""
         try:
             logger.info(f"开始获取ID为{password_id}的密码")
-            password = Password.get_by_id(password_id, request.user_id)
+            # 修订号和数据在同一个读事务中读取，保证ETag与响应内容一致
+            with Database.transaction(immediate=False):
+                etag = make_etag(request.user_id, VaultRevision.get(request.user_id), request.path)
+                if is_not_modified(etag):
+                    # 密码库没有变化，不查询passwords表
+                    logger.info(f"ID为{password_id}的密码未变化，返回304")
+                    return not_modified_response(etag)
+                password = Password.get_by_id(password_id, request.user_id)
+            
             if password:
                 logger.info(f"成功获取ID为{password_id}的密码记录")
-                return jsonify(password), 200
+                return with_etag(jsonify(password), etag), 200
             logger.warning(f"未找到ID为{password_id}的密码记录")
             return jsonify({'error': 'Password not found'}), 404
         except Exception as e:
             logger.exception(f"获取ID为{password_id}的密码失败: {str(e)}")
             return jsonify({'error': str(e)}), 500
     
+    @staticmethod
+    @token_required
+    def get_changes():
+        """增量同步：获取指定修订号之后创建、更新和删除的密码
+        
+        查询参数：
+            since: 客户端上次同步返回的revision，首次同步传0
+        
+        返回 {"revision": ..., "items": [...], "deleted": [{"id", "revision", "deletedAt"}]}
+        """
+        try:
+            since_arg = request.args.get('since', '0')
+            try:
+                since = int(since_arg)
+            except ValueError:
+                since = -1
+            if since < 0:
+                logger.warning(f"无效的增量同步参数since: {since_arg}")
+                return jsonify({'error': 'Invalid since'}), 400
+            
+            with Database.transaction(immediate=False):
+                etag = make_etag(request.user_id, VaultRevision.get(request.user_id), request.path, request.query_string)
+                if is_not_modified(etag):
+                    logger.info("密码库未变化，返回304")
+                    return not_modified_response(etag)
+                
+                logger.info(f"开始获取修订号{since}之后的密码变更")
+                body, revision = Password.get_changes_json(request.user_id, since)
+            
+            if since > revision:
+                # 客户端的修订号比服务端还新，说明本地状态不可信，需要全量同步
+                logger.warning(f"增量同步参数since={since}超过当前修订号{revision}")
+                return jsonify({'error': 'since is ahead of current revision'}), 400
+            
+            logger.info(f"成功获取密码变更，当前修订号{revision}")
+            response = current_app.response_class(body, mimetype='application/json')
+            return with_etag(response, etag), 200
+        except Exception as e:
+            logger.exception(f"获取密码变更失败: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @staticmethod
+    @token_required
+    def get_categories():
+        """获取分类及每个分类下的密码数量，供侧边栏使用，无需读取整个密码库
+        
+        返回 {"categories": [{"name": ..., "count": ...}], "total": 密码总数}
+        """
+        try:
+            etag = make_etag(request.user_id, VaultRevision.get(request.user_id), request.path)
+            if is_not_modified(etag):
+                logger.info("密码库未变化，返回304")
+                return not_modified_response(etag)
+            
+            categories, revision = Password.get_categories(request.user_id)
+            # 读取分类期间可能有新的写入，ETag以统计结果对应的修订号为准
+            etag = make_etag(request.user_id, revision, request.path)
+            total = sum(category['count'] for category in categories)
+            logger.info(f"成功获取分类统计，共{len(categories)}个分类")
+            return with_etag(jsonify({'categories': categories, 'total': total}), etag), 200
+        except Exception as e:
+            logger.exception(f"获取分类统计失败: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @staticmethod
+    @token_required
+    def search_passwords():
+        """按标题、用户名、网址、平台、分类搜索密码
+        
+        查询参数：
+            q: 关键词，多个关键词用空格分隔，每个关键词做前缀匹配
+            limit: 最多返回条数
+        
+        返回 {"items": [...]}，按相关度排序
+        """
+        try:
+            terms = request.args.get('q', '').split()[:current_config.PASSWORD_SEARCH_MAX_TERMS]
+            if not terms:
+                logger.warning("搜索缺少关键词")
+                return jsonify({'error': 'Missing search query'}), 400
+            
+            limit_arg = request.args.get('limit')
+            try:
+                limit = parse_limit(limit_arg, current_config.PASSWORD_SEARCH_DEFAULT_LIMIT, current_config.PASSWORD_SEARCH_MAX_LIMIT)
+            except ValueError:
+                logger.warning(f"无效的搜索参数limit: {limit_arg}")
+                return jsonify({'error': 'Invalid limit'}), 400
+            
+            logger.info(f"开始搜索密码，关键词{len(terms)}个")
+            body = Password.search_json(request.user_id, terms, limit)
+            return current_app.response_class(body, mimetype='application/json'), 200
+        except Exception as e:
+            logger.exception(f"搜索密码失败: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @staticmethod
+    @token_required
+    def export_passwords():
+        """流式导出当前用户的所有密码（NDJSON，每行一条记录）"""
+        try:
+            logger.info("开始导出密码")
+            body = Password.export_ndjson(request.user_id, current_config.PASSWORD_EXPORT_FETCH_SIZE)
+            response = current_app.response_class(body, mimetype='application/x-ndjson')
+            response.headers['Content-Disposition'] = 'attachment; filename="keyguard-export.ndjson"'
+            return response, 200
+        except Exception as e:
+            logger.exception(f"导出密码失败: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @staticmethod
+    @token_required
+    def import_passwords():
+        """从NDJSON导入密码，每行一条记录，字段与单条接口一致
+        
+        查询参数：
+            mode: upsert（默认，已存在则更新）或create（已存在时报错）
+        
+        请求体逐行解析，每PASSWORD_IMPORT_CHUNK_SIZE条在一个事务中提交一次。
+        单行错误（格式、字段类型等）不影响其他行；某个分块写入失败时只回滚该分块，
+        其中每一行都记为失败，继续导入后续分块。错误明细带行号返回
+        """
+        try:
+            mode = request.args.get('mode', 'upsert')
+            if mode not in ('create', 'upsert'):
+                logger.warning(f"无效的导入模式: {mode}")
+                return jsonify({'error': 'Invalid mode'}), 400
+            
+            logger.info(f"开始导入密码，模式: {mode}")
+            chunk_size = current_config.PASSWORD_IMPORT_CHUNK_SIZE
+            max_errors = current_config.PASSWORD_IMPORT_MAX_ERRORS
+            summary = {'created': 0, 'updated': 0, 'failed': 0}
+            errors = []
+            chunk, chunk_lines = [], []
+            
+            def record_error(line_number, password_id, error):
+                summary['failed'] += 1
+                if len(errors) < max_errors:
+                    errors.append({'line': line_number, 'id': password_id, 'error': error})
+            
+            def flush():
+                try:
+                    results = Password.bulk_upsert(request.user_id, chunk, [mode] * len(chunk))
+                except Exception as e:
+                    logger.exception(f"导入密码分块写入失败（第{chunk_lines[0]}-{chunk_lines[-1]}行）: {str(e)}")
+                    results = [
+                        {'id': item.get('id'), 'status': Password.RESULT_ERROR, 'error': f'Failed to write record: {str(e)}'}
+                        for item in chunk
+                    ]
+                for line_number, result in zip(chunk_lines, results):
+                    if result['status'] == Password.RESULT_ERROR:
+                        record_error(line_number, result['id'], result['error'])
+                    else:
+                        summary[result['status']] += 1
+                chunk.clear()
+                chunk_lines.clear()
+            
+            for line_number, item, error in iter_ndjson(request.stream, current_config.PASSWORD_IMPORT_MAX_LINE_BYTES):
+                if error is None and not isinstance(item, dict):
+                    error = 'Record must be a JSON object'
+                if error is not None:
+                    record_error(line_number, None, error)
+                    continue
+                chunk.append(item)
+                chunk_lines.append(line_number)
+                if len(chunk) >= chunk_size:
+                    flush()
+            if chunk:
+                flush()
+            # 校验失败的行在分块提交时才记录，按行号重新排序
+            errors.sort(key=lambda error: error['line'])
+            
+            logger.info(f"导入密码完成: {summary}")
+            return jsonify({
+                'success': summary['failed'] == 0,
+                'summary': summary,
+                'errors': errors,
+                'errorsTruncated': summary['failed'] > len(errors)
+            }), 200
+        except Exception as e:
+            logger.exception(f"导入密码失败: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
     @staticmethod
     @token_required
     def create_password():
-        """创建新密码"""
+        """创建或更新密码
+        
+        单条UPSERT语句完成写入。请求头带If-Match（记录版本号，如 "3"）时，
+        只有记录存在且当前版本一致才更新，否则返回409（记录已被删除时currentVersion为null）
+        """
         try:
             logger.info("开始保存密码操作")
             password_data = request.json
@@ -54,35 +323,37 @@ class PasswordController:
                     logger.warning(f"保存密码缺少必要字段: {field}")
                     return jsonify({'error': f'Missing required field: {field}'}), 400
             
+            try:
+                expected_version = get_if_match_version()
+            except ValueError:
+                logger.warning(f"无效的If-Match请求头: {request.headers.get('If-Match')}")
+                return jsonify({'error': 'Invalid If-Match'}), 400
+            
             # 隐藏敏感信息
             log_data = password_data.copy()
             if 'password' in log_data:
                 log_data['password'] = '***'  # 隐藏密码内容
             
-            # 检查密码是否已存在
-            existing_password = Password.get_by_id(password_data['id'], request.user_id)
-            if existing_password:
-                # 更新现有密码
-                logger.info(f"更新ID为{password_data['id']}的密码记录")
-                logger.debug(f"更新密码数据: {log_data}")
-                success = Password.update(password_data['id'], password_data)
-                if success:
-                    logger.info(f"成功更新ID为{password_data['id']}的密码记录")
-                else:
-                    logger.error(f"更新ID为{password_data['id']}的密码记录失败")
-            else:
-                # 创建新密码
-                logger.info(f"创建ID为{password_data['id']}的新密码记录")
-                logger.debug(f"创建密码数据: {log_data}")
-                success = Password.create(password_data)
-                if success:
-                    logger.info(f"成功创建ID为{password_data['id']}的新密码记录")
-                else:
-                    logger.error(f"创建ID为{password_data['id']}的新密码记录失败")
+            logger.info(f"保存ID为{password_data['id']}的密码记录")
+            logger.debug(f"保存密码数据: {log_data}")
+            try:
+                version = Password.save(password_data, expected_version)
+            except VersionConflictError as e:
+                logger.warning(f"保存ID为{password_data['id']}的密码记录失败: 版本冲突，当前版本{e.current_version}")
+                return jsonify({'error': 'Version conflict', 'currentVersion': e.current_version}), 409
             
-            if success:
-                return jsonify({'success': True}), 200
-            return jsonify({'error': 'Failed to save password'}), 500
+            if version is None:
+                logger.warning(f"保存ID为{password_data['id']}的密码记录失败: ID已被占用")
+                return jsonify({'error': 'Password id already in use'}), 409
+            
+            logger.info(f"成功保存ID为{password_data['id']}的密码记录，版本{version}")
+            return jsonify({'success': True, 'version': version}), 200
+        except WriteQueueBusyError:
+            # 数据库写入队列繁忙，让客户端稍后重试
+            logger.warning("保存密码失败: 数据库写入队列繁忙")
+            response = jsonify({'error': 'Server busy, please retry later'})
+            response.headers['Retry-After'] = str(current_config.DB_WRITE_QUEUE_RETRY_AFTER_SECONDS)
+            return response, 503
         except Exception as e:
             logger.exception(f"保存密码失败: {str(e)}")
             return jsonify({'error': str(e)}), 500
@@ -90,7 +361,10 @@ class PasswordController:
     @staticmethod
     @token_required
     def update_password(password_id):
-        """更新密码"""
+        """更新密码
+        
+        请求头带If-Match（记录版本号，如 "3"）时，只有当前版本一致才更新，否则返回409
+        """
         try:
             logger.info(f"开始更新ID为{password_id}的密码")
             password_data = request.json
@@ -98,6 +372,12 @@ class PasswordController:
                 logger.warning("更新密码缺少数据")
                 return jsonify({'error': 'Missing password data'}), 400
             
+            try:
+                expected_version = get_if_match_version()
+            except ValueError:
+                logger.warning(f"无效的If-Match请求头: {request.headers.get('If-Match')}")
+                return jsonify({'error': 'Invalid If-Match'}), 400
+            
             # 添加当前用户ID
             password_data['userId'] = request.user_id
             
@@ -107,12 +387,23 @@ class PasswordController:
                 log_data['password'] = '***'  # 隐藏密码内容
             
             logger.debug(f"更新密码数据: {log_data}")
-            success = Password.update(password_id, password_data)
-            if success:
-                logger.info(f"成功更新ID为{password_id}的密码")
-                return jsonify({'success': True}), 200
+            try:
+                version = Password.update(password_id, password_data, expected_version)
+            except VersionConflictError as e:
+                logger.warning(f"更新ID为{password_id}的密码失败: 版本冲突，当前版本{e.current_version}")
+                return jsonify({'error': 'Version conflict', 'currentVersion': e.current_version}), 409
+            
+            if version is not None:
+                logger.info(f"成功更新ID为{password_id}的密码，版本{version}")
+                return jsonify({'success': True, 'version': version}), 200
             logger.error(f"更新ID为{password_id}的密码失败: 未找到或更新失败")
             return jsonify({'error': 'Password not found or update failed'}), 404
+        except WriteQueueBusyError:
+            # 数据库写入队列繁忙，让客户端稍后重试
+            logger.warning("更新密码失败: 数据库写入队列繁忙")
+            response = jsonify({'error': 'Server busy, please retry later'})
+            response.headers['Retry-After'] = str(current_config.DB_WRITE_QUEUE_RETRY_AFTER_SECONDS)
+            return response, 503
         except Exception as e:
             logger.exception(f"更新ID为{password_id}的密码失败: {str(e)}")
             return jsonify({'error': str(e)}), 500
@@ -129,6 +420,107 @@ class PasswordController:
                 return jsonify({'success': True}), 200
             logger.warning(f"未找到ID为{password_id}的密码记录")
             return jsonify({'error': 'Password not found'}), 404
+        except WriteQueueBusyError:
+            # 数据库写入队列繁忙，让客户端稍后重试
+            logger.warning("删除密码失败: 数据库写入队列繁忙")
+            response = jsonify({'error': 'Server busy, please retry later'})
+            response.headers['Retry-After'] = str(current_config.DB_WRITE_QUEUE_RETRY_AFTER_SECONDS)
+            return response, 503
         except Exception as e:
             logger.exception(f"删除ID为{password_id}的密码失败: {str(e)}")
             return jsonify({'error': str(e)}), 500
+    
+    @staticmethod
+    @token_required
+    def batch_passwords():
+        """批量创建、更新、删除密码
+        
+        请求体格式：
+            {"operations": [
+                {"op": "create", "data": {...}},
+                {"op": "update", "data": {"id": "...", ...}},
+                {"op": "upsert", "data": {...}},
+                {"op": "delete", "id": "..."}
+            ]}
+        
+        所有操作在同一事务中执行，单项失败不影响其他项，结果按请求顺序逐项返回。
+        同一批次中每个密码ID只能出现一次。
+        """
+        try:
+            data = request.json
+            operations = data.get('operations') if isinstance(data, dict) else None
+            if not isinstance(operations, list):
+                logger.warning("批量操作缺少operations列表")
+                return jsonify({'error': 'Missing operations list'}), 400
+            
+            max_operations = current_config.PASSWORD_BATCH_MAX_OPERATIONS
+            if len(operations) > max_operations:
+                logger.warning(f"批量操作数量{len(operations)}超过上限{max_operations}")
+                return jsonify({'error': f'Too many operations, maximum is {max_operations}'}), 400
+            
+            logger.info(f"开始批量操作密码，共{len(operations)}项")
+            
+            results = [None] * len(operations)
+            write_indexes, write_items, write_modes = [], [], []
+            delete_indexes, delete_ids = [], []
+            seen_ids = set()
+            
+            for index, operation in enumerate(operations):
+                op = operation.get('op') if isinstance(operation, dict) else None
+                if op in BATCH_WRITE_OPS:
+                    item = operation.get('data')
+                    password_id = item.get('id') if isinstance(item, dict) else None
+                elif op == BATCH_DELETE_OP:
+                    item = None
+                    password_id = operation.get('id')
+                else:
+                    results[index] = {'index': index, 'op': op, 'id': None, 'status': Password.RESULT_ERROR, 'error': 'Invalid op'}
+                    continue
+                
+                if not password_id:
+                    results[index] = {'index': index, 'op': op, 'id': None, 'status': Password.RESULT_ERROR, 'error': 'Missing required field: id'}
+                    continue
+                if not isinstance(password_id, str):
+                    results[index] = {'index': index, 'op': op, 'id': None, 'status': Password.RESULT_ERROR, 'error': 'Invalid field type: id must be a string'}
+                    continue
+                if password_id in seen_ids:
+                    results[index] = {'index': index, 'op': op, 'id': password_id, 'status': Password.RESULT_ERROR, 'error': 'Duplicate id in batch'}
+                    continue
+                seen_ids.add(password_id)
+                
+                if op == BATCH_DELETE_OP:
+                    delete_indexes.append(index)
+                    delete_ids.append(password_id)
+                else:
+                    write_indexes.append(index)
+                    write_items.append(item)
+                    write_modes.append(op)
+            
+            # 写入和删除在同一事务中完成，一次提交
+            with Database.transaction():
+                write_results = Password.bulk_upsert(request.user_id, write_items, write_modes) if write_items else []
+                delete_results = Password.bulk_delete(request.user_id, delete_ids) if delete_ids else []
+            
+            for index, result in zip(write_indexes, write_results):
+                results[index] = dict(result, index=index, op=operations[index]['op'])
+            for index, result in zip(delete_indexes, delete_results):
+                results[index] = dict(result, index=index, op=BATCH_DELETE_OP)
+            
+            summary = {'created': 0, 'updated': 0, 'deleted': 0, 'failed': 0}
+            for result in results:
+                if result['status'] == Password.RESULT_ERROR:
+                    summary['failed'] += 1
+                else:
+                    summary[result['status']] += 1
+            
+            logger.info(f"批量操作密码完成: {summary}")
+            return jsonify({'success': summary['failed'] == 0, 'summary': summary, 'results': results}), 200
+        except WriteQueueBusyError:
+            # 数据库写入队列繁忙，让客户端稍后重试
+            logger.warning("批量操作密码失败: 数据库写入队列繁忙")
+            response = jsonify({'error': 'Server busy, please retry later'})
+            response.headers['Retry-After'] = str(current_config.DB_WRITE_QUEUE_RETRY_AFTER_SECONDS)
+            return response, 503
+        except Exception as e:
+            logger.exception(f"批量操作密码失败: {str(e)}")
+            return jsonify({'error': str(e)}), 500
@@ -1,15 +1,71 @@
+import os
+import time
+import hashlib
 from flask import request, jsonify
-from utils.jwt import JWTUtil
+from utils.jwt import JWTUtil, add_key_removed_listener
+from utils.cache import LRUCache
 from models.user import User
+from models.token_revocation import TokenRevocation
+from config.config import config
 from utils.log import Logger
 
 # 初始化日志
 logger = Logger.get_logger('auth_middleware')
 
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+# 已验证令牌的缓存：{令牌摘要: 验证结果}，条目在令牌过期时失效
+_token_cache = LRUCache(current_config.AUTH_TOKEN_CACHE_SIZE)
+
+
+def token_digest(token):
+    """令牌的缓存键，不在内存中保留令牌原文"""
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+def verify_token_cached(token):
+    """验证JWT令牌，同一令牌验证成功后在过期前直接使用缓存的结果
+    
+    只缓存验证成功的结果，无效令牌每次都重新验证
+    """
+    if not current_config.AUTH_TOKEN_CACHE_SIZE:
+        return JWTUtil.verify_token(token)
+    
+    key = token_digest(token)
+    result = _token_cache.get(key)
+    if result is not None:
+        if result['exp'] > time.time():
+            return result
+        # 缓存的TTL基于单调时钟，这里再按墙钟确认一次，保证不会放行已过期的令牌
+        _token_cache.pop(key)
+    
+    result = JWTUtil.verify_token(token)
+    if result['valid']:
+        ttl = result['exp'] - time.time()
+        if ttl > 0:
+            _token_cache.set(key, result, ttl=ttl)
+    return result
+
+
+def invalidate_token(token):
+    """从缓存中移除令牌（令牌被撤销时调用）"""
+    _token_cache.pop(token_digest(token))
+
+
+def clear_token_cache():
+    """清空令牌缓存（撤销用户全部令牌、公钥下线或替换时调用）"""
+    _token_cache.clear()
+
+
+# 公钥下线后，用它签名的令牌即使仍在缓存中也不能再通过验证
+add_key_removed_listener(clear_token_cache)
+
+
 def token_required(f):
     """认证中间件，验证JWT令牌"""
     def decorated(*args, **kwargs):
-        logger.info(f"开始认证中间件检查 - 路径: {request.path}")
+        logger.debug(f"开始认证中间件检查 - 路径: {request.path}")
         
         token = request.headers.get('Authorization')
         
@@ -23,12 +79,16 @@ def token_required(f):
         
         logger.debug("验证JWT令牌")
         # 验证令牌
-        result = JWTUtil.verify_token(token)
+        result = verify_token_cached(token)
         if not result['valid']:
             logger.warning(f"JWT令牌验证失败: {result['error']}")
             return jsonify({'error': result['error']}), 401
         
-        logger.info(f"JWT令牌验证成功 - 用户: {result['username']}")
+        if TokenRevocation.is_revoked(result['jti'], result['user_id'], result['iat']):
+            logger.warning(f"JWT令牌已被撤销 - 用户: {result['username']}")
+            return jsonify({'error': 'Token has been revoked'}), 401
+        
+        logger.debug(f"JWT令牌验证成功 - 用户: {result['username']}")
         
         # 从令牌中获取IP地址
         token_ip_address = result.get('ip_address')
@@ -45,6 +105,8 @@ def token_required(f):
         # 将用户信息添加到请求上下文
         request.user_id = result['user_id']
         request.username = result['username']
+        request.token = token
+        request.token_claims = result
         
         logger.debug(f"认证中间件检查通过 - 用户: {result['username']}, 路径: {request.path}")
         return f(*args, **kwargs)
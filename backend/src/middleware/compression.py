@@ -0,0 +1,103 @@
+"""
+响应压缩中间件
+根据请求的Accept-Encoding使用gzip或deflate压缩响应体，
+对API接口和前端静态文件统一生效
+"""
+import os
+import zlib
+from flask import request
+from config.config import config
+from utils.log import Logger
+
+# 初始化日志
+logger = Logger.get_logger('compression')
+
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+# 支持的编码及对应的zlib窗口参数：gzip为31（带gzip头），deflate为15（zlib格式）
+ENCODING_WBITS = {
+    'gzip': 31,
+    'deflate': 15
+}
+
+
+def choose_encoding():
+    """根据Accept-Encoding选择压缩编码，客户端不接受时返回None"""
+    return request.accept_encodings.best_match(ENCODING_WBITS.keys())
+
+
+def should_compress(response):
+    """判断响应是否适合压缩（不考虑客户端是否接受）"""
+    if request.method == 'HEAD':
+        return False
+    if response.status_code < 200 or response.status_code >= 300 or response.status_code in (204, 206):
+        return False
+    if 'Content-Encoding' in response.headers or 'Content-Range' in response.headers:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    return response.mimetype in current_config.COMPRESSION_MIMETYPES
+
+
+def add_vary(response):
+    """声明响应内容随Accept-Encoding变化，避免缓存把压缩内容发给不支持的客户端"""
+    response.vary.add('Accept-Encoding')
+
+
+def compress_stream(chunks, wbits, level):
+    """流式压缩生成器，每个数据块压缩后立即输出，不等待整个响应生成完"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # 关闭原始迭代器，释放其占用的资源（如数据库连接）
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    """after_request钩子：按需压缩响应体"""
+    if not current_config.COMPRESSION_ENABLED or not should_compress(response):
+        return response
+
+    add_vary(response)
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    wbits = ENCODING_WBITS[encoding]
+    level = current_config.COMPRESSION_LEVEL
+
+    if response.is_streamed and not response.direct_passthrough:
+        # 生成器响应：长度未知，边生成边压缩
+        response.response = compress_stream(response.response, wbits, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        # send_from_directory返回的文件响应为direct_passthrough，读取文件内容后压缩
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < current_config.COMPRESSION_MIN_SIZE:
+            return response
+        compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+        response.set_data(compressor.compress(data) + compressor.flush())
+        logger.debug(f"响应已使用{encoding}压缩: {len(data)} -> {response.content_length} 字节")
+
+    response.headers['Content-Encoding'] = encoding
+    # 压缩后的内容与原内容语义相同但字节不同，强ETag改为弱ETag
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """为应用注册响应压缩钩子"""
+    app.after_request(compress_response)
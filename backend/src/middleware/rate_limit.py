@@ -0,0 +1,88 @@
+"""
+未认证接口的限流中间件
+按客户端IP和邀请码分别限流，超出时返回429和Retry-After，
+请求在访问数据库之前就被拒绝，避免恶意请求占满工作线程和数据库
+"""
+import os
+import math
+import threading
+from flask import request, jsonify
+from utils.rate_limit import create_token_bucket
+from config.config import config
+from utils.log import Logger
+
+# 初始化日志
+logger = Logger.get_logger('rate_limit_middleware')
+
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+# 邀请码键的最大长度，避免超长的伪造邀请码占用限流器内存
+MAX_INVITE_KEY_LENGTH = 64
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """获取限流器（ip或invite），首次调用时按配置创建"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                if name == 'ip':
+                    rate, burst = current_config.RATE_LIMIT_IP_RATE, current_config.RATE_LIMIT_IP_BURST
+                else:
+                    rate, burst = current_config.RATE_LIMIT_INVITE_RATE, current_config.RATE_LIMIT_INVITE_BURST
+                limiter = create_token_bucket(
+                    name, rate, burst,
+                    backend=current_config.RATE_LIMIT_BACKEND,
+                    db_path=current_config.RATE_LIMIT_DB_PATH,
+                    maxsize=current_config.RATE_LIMIT_MAX_KEYS
+                )
+                _limiters[name] = limiter
+    return limiter
+
+
+def get_request_invite_code():
+    """从JSON请求体或查询参数中读取邀请码，不存在时返回None"""
+    data = request.get_json(silent=True)
+    invite_code = data.get('inviteCode') if isinstance(data, dict) else None
+    if invite_code is None:
+        invite_code = request.args.get('inviteCode')
+    if not isinstance(invite_code, str) or not invite_code:
+        return None
+    return invite_code[:MAX_INVITE_KEY_LENGTH]
+
+
+def too_many_requests(retry_after):
+    """429响应"""
+    response = jsonify({'error': 'Too many requests, please retry later'})
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, 429
+
+
+def rate_limited(f):
+    """限流中间件：先按客户端IP限流，再按邀请码限流（防止分散IP针对同一账户猜测）"""
+    def decorated(*args, **kwargs):
+        if not current_config.RATE_LIMIT_ENABLED:
+            return f(*args, **kwargs)
+
+        ip_address = request.remote_addr
+        retry_after = get_limiter('ip').acquire(ip_address)
+        if retry_after:
+            logger.warning(f"请求过于频繁 - IP: {ip_address}, 路径: {request.path}")
+            return too_many_requests(retry_after)
+
+        invite_code = get_request_invite_code()
+        if invite_code is not None:
+            retry_after = get_limiter('invite').acquire(invite_code)
+            if retry_after:
+                logger.warning(f"同一邀请码请求过于频繁 - IP: {ip_address}, 路径: {request.path}")
+                return too_many_requests(retry_after)
+
+        return f(*args, **kwargs)
+
+    decorated.__name__ = f.__name__
+    return decorated
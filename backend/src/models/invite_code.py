@@ -1,7 +1,12 @@
 from datetime import datetime, timedelta
-from utils.db import Database
+from utils.db import Database, model_row_factory
+
+# 查询列，顺序与InviteCode.__init__的参数一致
+INVITE_CODE_COLUMNS = 'id, code, status, created_at, updated_at, expires_at'
 
 class InviteCode:
+    __slots__ = ('id', 'code', 'status', 'created_at', 'updated_at', 'expires_at')
+    
     # 邀请码状态常量
     STATUS_ACTIVE = 'active'    # 可用
     STATUS_USED = 'used'        # 已使用
@@ -15,10 +20,16 @@ class InviteCode:
         self.id = id
         self.code = code
         self.status = status
-        self.created_at = created_at or datetime.now().isoformat()
-        self.updated_at = updated_at or datetime.now().isoformat()
-        # 设置默认过期时间为创建后30天
-        self.expires_at = expires_at or (datetime.now() + timedelta(days=30)).isoformat()
+        # 只在缺少时间戳时才取当前时间
+        if created_at is None or updated_at is None or expires_at is None:
+            now = datetime.now()
+            created_at = created_at or now.isoformat()
+            updated_at = updated_at or now.isoformat()
+            # 设置默认过期时间为创建后30天
+            expires_at = expires_at or (now + timedelta(days=30)).isoformat()
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.expires_at = expires_at
     
     def to_dict(self):
         """转换为字典格式"""
@@ -82,20 +93,7 @@ class InviteCode:
     @classmethod
     def get_by_code(cls, code):
         """根据邀请码获取邀请码对象"""
-        query = 'SELECT * FROM invite_codes WHERE code = ?'
-        result = Database.execute_query(query, (code,))
-        
-        if result:
-            row = result[0]
-            return cls(
-                id=row['id'],
-                code=row['code'],
-                status=row['status'],
-                created_at=row['created_at'],
-                updated_at=row['updated_at'],
-                expires_at=row['expires_at']
-            )
-        return None
+        return Database.fetch_one('invite_codes.get_by_code', (code,))
     
     @classmethod
     def update_status(cls, code, new_status):
@@ -129,34 +127,15 @@ class InviteCode:
     @classmethod
     def get_all_invite_codes(cls):
         """获取所有邀请码"""
-        query = 'SELECT * FROM invite_codes'
-        results = Database.execute_query(query)
-        
-        return [cls(
-            id=row['id'],
-            code=row['code'],
-            status=row['status'],
-            created_at=row['created_at'],
-            updated_at=row['updated_at'],
-            expires_at=row['expires_at']
-        ) for row in results]
+        return Database.fetch_all('invite_codes.list')
     
     @classmethod
     def get_available_codes(cls):
         """获取所有可用的邀请码（状态为active且未过期）"""
-        query = 'SELECT * FROM invite_codes WHERE status = ?'
-        results = Database.execute_query(query, (cls.STATUS_ACTIVE,))
+        results = Database.fetch_all('invite_codes.list_by_status', (cls.STATUS_ACTIVE,))
         
         available_codes = []
-        for row in results:
-            invite_code = cls(
-                id=row['id'],
-                code=row['code'],
-                status=row['status'],
-                created_at=row['created_at'],
-                updated_at=row['updated_at'],
-                expires_at=row['expires_at']
-            )
+        for invite_code in results:
             # 检查是否过期
             if invite_code.is_valid():
                 available_codes.append(invite_code)
@@ -169,17 +148,7 @@ class InviteCode:
         if status not in cls.VALID_STATUSES:
             raise ValueError(f'Invalid status: {status}. Valid statuses are: {cls.VALID_STATUSES}')
         
-        query = 'SELECT * FROM invite_codes WHERE status = ?'
-        results = Database.execute_query(query, (status,))
-        
-        return [cls(
-            id=row['id'],
-            code=row['code'],
-            status=row['status'],
-            created_at=row['created_at'],
-            updated_at=row['updated_at'],
-            expires_at=row['expires_at']
-        ) for row in results]
+        return Database.fetch_all('invite_codes.list_by_status', (status,))
     
     @classmethod
     def delete(cls, code):
@@ -203,3 +172,21 @@ class InviteCode:
         )
         
         return Database.execute_query(query, params, commit=True)
+
+
+# 行直接构造InviteCode对象
+Database.register(
+    'invite_codes.get_by_code',
+    f'SELECT {INVITE_CODE_COLUMNS} FROM invite_codes WHERE code = ?',
+    row_factory=model_row_factory(InviteCode)
+)
+Database.register(
+    'invite_codes.list',
+    f'SELECT {INVITE_CODE_COLUMNS} FROM invite_codes',
+    row_factory=model_row_factory(InviteCode)
+)
+Database.register(
+    'invite_codes.list_by_status',
+    f'SELECT {INVITE_CODE_COLUMNS} FROM invite_codes WHERE status = ?',
+    row_factory=model_row_factory(InviteCode)
+)
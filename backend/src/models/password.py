@@ -1,8 +1,332 @@
+import os
 from datetime import datetime
-from utils.db import Database
+from utils.db import Database, dict_row_factory, scalar_row_factory, RAW_TUPLES
+from utils.serializer import RowSerializer, encode_value
+from utils.pagination import encode_cursor, decode_cursor
+from utils.cache import LRUCache
+from config.config import config
+from models.vault_revision import VaultRevision
+
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+# 接口输出字段，与SELECT_COLUMNS一一对应
+OUTPUT_FIELDS = (
+    'id', 'userId', 'title', 'username', 'password', 'url',
+    'category', 'notes', 'platform', 'createdAt', 'updatedAt', 'version'
+)
+
+# 查询列，可为空的列在SQL中转换为空字符串，与to_dict的输出保持一致
+SELECT_COLUMNS = '''
+    id, user_id, title, username, password, COALESCE(url, ''),
+    category, COALESCE(notes, ''), COALESCE(platform, ''), created_at, updated_at, version
+'''
+
+# 行直接映射为接口输出的字典
+Database.register(
+    'passwords.get_by_id',
+    f'SELECT {SELECT_COLUMNS} FROM passwords WHERE id = ? AND user_id = ?',
+    row_factory=dict_row_factory(OUTPUT_FIELDS)
+)
+
+# 批量写入使用的语句
+Database.register(
+    'passwords.insert',
+    '''
+        INSERT INTO passwords (
+            id, user_id, title, username, password, url,
+            category, notes, platform, created_at, updated_at, revision
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+)
+# 未提供的字段（None）保持原值
+Database.register(
+    'passwords.update_partial',
+    '''
+        UPDATE passwords SET
+            title = COALESCE(?, title), username = COALESCE(?, username),
+            password = COALESCE(?, password), url = COALESCE(?, url),
+            category = COALESCE(?, category), notes = COALESCE(?, notes),
+            platform = COALESCE(?, platform), updated_at = ?, revision = ?, version = version + 1
+        WHERE id = ? AND user_id = ?
+    '''
+)
+# 单条语句完成创建或更新：ID不存在时插入，属于当前用户时更新，属于其他用户时不做任何修改。
+# 未提供的可选字段保持原值；带期望版本号的写入走passwords.update_checked，不会插入新记录
+Database.register(
+    'passwords.upsert',
+    '''
+        INSERT INTO passwords (
+            id, user_id, title, username, password, url,
+            category, notes, platform, created_at, updated_at, revision
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            title = excluded.title, username = excluded.username, password = excluded.password,
+            url = COALESCE(excluded.url, url), category = excluded.category,
+            notes = COALESCE(excluded.notes, notes), platform = COALESCE(excluded.platform, platform),
+            updated_at = excluded.updated_at, revision = excluded.revision, version = version + 1
+        WHERE user_id = excluded.user_id
+        RETURNING version
+    ''',
+    row_factory=scalar_row_factory
+)
+# 单条语句完成部分更新，提供期望版本号时只有版本一致才更新
+Database.register(
+    'passwords.update_checked',
+    '''
+        UPDATE passwords SET
+            title = COALESCE(?, title), username = COALESCE(?, username),
+            password = COALESCE(?, password), url = COALESCE(?, url),
+            category = COALESCE(?, category), notes = COALESCE(?, notes),
+            platform = COALESCE(?, platform), updated_at = ?, revision = ?, version = version + 1
+        WHERE id = ? AND user_id = ? AND (? IS NULL OR version = ?)
+        RETURNING version
+    ''',
+    row_factory=scalar_row_factory
+)
+# 写入失败时区分原因：ID不存在、属于其他用户或版本不一致
+Database.register('passwords.get_owner_version', 'SELECT user_id, version FROM passwords WHERE id = ?')
+Database.register('passwords.delete', 'DELETE FROM passwords WHERE id = ? AND user_id = ?')
+
+# 分类统计，走(user_id, category, ...)索引，不读取记录内容
+Database.register(
+    'passwords.category_counts',
+    'SELECT category, COUNT(*) FROM passwords WHERE user_id = ? GROUP BY category ORDER BY category',
+    row_factory=RAW_TUPLES
+)
+
+# 增量同步：修订号之后创建或更新的记录，以及删除记录的墓碑
+CHANGE_FIELDS = OUTPUT_FIELDS + ('revision',)
+TOMBSTONE_FIELDS = ('id', 'revision', 'deletedAt')
+
+Database.register(
+    'passwords.changed_since',
+    f'SELECT {SELECT_COLUMNS}, revision FROM passwords WHERE user_id = ? AND revision > ? ORDER BY revision, id',
+    row_factory=RAW_TUPLES
+)
+Database.register(
+    'password_tombstones.since',
+    'SELECT id, revision, deleted_at FROM password_tombstones WHERE user_id = ? AND revision > ? ORDER BY revision, id',
+    row_factory=RAW_TUPLES
+)
+Database.register(
+    'password_tombstones.insert',
+    '''
+        INSERT INTO password_tombstones (id, user_id, revision, deleted_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, id) DO UPDATE SET revision = excluded.revision, deleted_at = excluded.deleted_at
+    '''
+)
+Database.register(
+    'password_tombstones.insert_for_user',
+    '''
+        INSERT INTO password_tombstones (id, user_id, revision, deleted_at)
+        SELECT id, user_id, ?, ? FROM passwords WHERE user_id = ?
+        ON CONFLICT(user_id, id) DO UPDATE SET revision = excluded.revision, deleted_at = excluded.deleted_at
+    '''
+)
+# 重新创建已删除的ID时清除它的墓碑
+Database.register('password_tombstones.delete', 'DELETE FROM password_tombstones WHERE user_id = ? AND id = ?')
+Database.register('password_tombstones.delete_by_user', 'DELETE FROM password_tombstones WHERE user_id = ?')
+
+CHANGE_SERIALIZER = RowSerializer(CHANGE_FIELDS)
+TOMBSTONE_SERIALIZER = RowSerializer(TOMBSTONE_FIELDS)
+
+# 接口字段对应的查询列
+FIELD_COLUMNS = {
+    'id': 'id',
+    'userId': 'user_id',
+    'title': 'title',
+    'username': 'username',
+    'password': 'password',
+    'url': "COALESCE(url, '')",
+    'category': 'category',
+    'notes': "COALESCE(notes, '')",
+    'platform': "COALESCE(platform, '')",
+    'createdAt': 'created_at',
+    'updatedAt': 'updated_at',
+    'version': 'version'
+}
+
+# 列表视图只需要的字段，不包含加密的密码和备注
+SUMMARY_FIELDS = ('id', 'title', 'username', 'url', 'category', 'platform')
+
+# 列表排序键
+SORT_COLUMNS = ('category', 'title', 'id')
+
+
+class Projection:
+    """列表查询的字段投影
+    
+    只在SQL层查询需要的列，排序键不在投影中时追加到查询列末尾，
+    序列化时只输出投影字段（RowSerializer按字段数截断行）
+    """
+    __slots__ = ('fields', 'serializer', 'sort_key_indexes', 'list_statement', 'first_statement', 'after_statement')
+    
+    def __init__(self, fields):
+        self.fields = fields
+        self.serializer = RowSerializer(fields)
+        
+        columns = [FIELD_COLUMNS[field] for field in fields]
+        self.sort_key_indexes = []
+        for sort_column in SORT_COLUMNS:
+            if sort_column not in columns:
+                columns.append(sort_column)
+            self.sort_key_indexes.append(columns.index(sort_column))
+        
+        select_columns = ', '.join(columns)
+        suffix = '' if fields == OUTPUT_FIELDS else '[' + ','.join(fields) + ']'
+        self.list_statement = Database.register(
+            'passwords.list_by_user_rows' + suffix,
+            f'SELECT {select_columns} FROM passwords WHERE user_id = ? ORDER BY category, title, id',
+            row_factory=RAW_TUPLES
+        ).name
+        # 键集分页：按(category, title, id)排序，从游标位置之后开始取
+        self.first_statement = Database.register(
+            'passwords.page_first' + suffix,
+            f'SELECT {select_columns} FROM passwords WHERE user_id = ? ORDER BY category, title, id LIMIT ?',
+            row_factory=RAW_TUPLES
+        ).name
+        self.after_statement = Database.register(
+            'passwords.page_after' + suffix,
+            f'''
+                SELECT {select_columns} FROM passwords
+                WHERE user_id = ? AND (category, title, id) > (?, ?, ?)
+                ORDER BY category, title, id LIMIT ?
+            ''',
+            row_factory=RAW_TUPLES
+        ).name
+
+
+# 已创建的投影，按字段元组缓存
+_projections = {}
+
+
+def get_projection(fields=None):
+    """获取字段投影，fields为None时返回全部字段
+    
+    Raises:
+        ValueError: 包含未知字段
+    """
+    if fields is None:
+        fields = OUTPUT_FIELDS
+    else:
+        unknown = [field for field in fields if field not in FIELD_COLUMNS]
+        if unknown:
+            raise ValueError(f'Unknown field: {unknown[0]}')
+        # 统一按输出字段顺序排列并始终包含id，使相同的字段集合共用同一组语句
+        requested = set(fields)
+        requested.add('id')
+        fields = tuple(field for field in OUTPUT_FIELDS if field in requested)
+    
+    projection = _projections.get(fields)
+    if projection is None:
+        projection = _projections.setdefault(fields, Projection(fields))
+    return projection
+
+
+# 预先创建默认投影和列表视图投影
+get_projection()
+get_projection(SUMMARY_FIELDS)
+
+# 搜索：FTS5全文索引（见迁移6），不可用时退回LIKE查询
+SEARCH_COLUMNS = '''
+    p.id, p.user_id, p.title, p.username, p.password, COALESCE(p.url, ''),
+    p.category, COALESCE(p.notes, ''), COALESCE(p.platform, ''), p.created_at, p.updated_at, p.version
+'''
+# 参与搜索的列及bm25权重（user_id列只用于限定用户，不参与打分）
+SEARCH_FIELD_COLUMNS = ('title', 'username', 'url', 'platform', 'category')
+SEARCH_WEIGHTS = '0.0, 10.0, 5.0, 3.0, 3.0, 1.0'
+
+Database.register(
+    'passwords.search',
+    f'''
+        SELECT {SEARCH_COLUMNS} FROM passwords_fts
+        JOIN passwords p ON p.rowid = passwords_fts.rowid
+        WHERE passwords_fts MATCH ? AND p.user_id = ?
+        ORDER BY bm25(passwords_fts, {SEARCH_WEIGHTS}), p.id LIMIT ?
+    ''',
+    row_factory=RAW_TUPLES
+)
+Database.register(
+    'passwords.search_index_exists',
+    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'passwords_fts'",
+    row_factory=scalar_row_factory
+)
+
+
+def fts_phrase(text):
+    """把文本转换为FTS5的短语字面量，双引号需要写两次"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def build_match_query(user_id, terms):
+    """构造FTS5查询：限定用户，每个关键词做前缀匹配，所有关键词都要命中"""
+    columns = '{' + ' '.join(SEARCH_FIELD_COLUMNS) + '}'
+    return f'user_id : {fts_phrase(user_id)} AND {columns} : (' + ' '.join(fts_phrase(term) + '*' for term in terms) + ')'
+
+
+def escape_like(text):
+    """转义LIKE模式中的通配符"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def get_like_search_statement(term_count):
+    """获取LIKE退回查询的语句，按关键词个数注册一次"""
+    name = f'passwords.search_like[{term_count}]'
+    try:
+        return Database.statement(name).name
+    except KeyError:
+        pass
+    term_condition = '(' + ' OR '.join(f"{column} LIKE ? ESCAPE '\\'" for column in SEARCH_FIELD_COLUMNS) + ')'
+    conditions = ' AND '.join([term_condition] * term_count)
+    return Database.register(
+        name,
+        f'''
+            SELECT {SELECT_COLUMNS} FROM passwords
+            WHERE user_id = ? AND {conditions}
+            ORDER BY category, title, id LIMIT ?
+        ''',
+        row_factory=RAW_TUPLES
+    ).name
+
+
+class VersionConflictError(Exception):
+    """密码记录的当前版本与客户端期望的版本不一致"""
+    
+    def __init__(self, password_id, current_version):
+        super().__init__(f'Version conflict for password {password_id}: current version is {current_version}')
+        self.password_id = password_id
+        self.current_version = current_version
+
+
+# 分类统计缓存：{用户ID: (修订号, 分类列表)}
+_category_cache = LRUCache(current_config.PASSWORD_CATEGORY_CACHE_SIZE)
+
+# IN查询每批的参数个数，低于旧版本SQLite的999个变量上限
+LOOKUP_CHUNK_SIZE = 500
 
 class Password:
-    def __init__(self, id, user_id, title, username, password, category, url='', notes='', platform='', created_at=None, updated_at=None):
+    __slots__ = (
+        'id', 'user_id', 'title', 'username', 'password', 'url',
+        'category', 'notes', 'platform', 'created_at', 'updated_at', 'revision', 'version'
+    )
+    
+    # 创建密码时的必要字段
+    REQUIRED_FIELDS = ('id', 'title', 'username', 'password', 'category')
+    # 写入时的文本字段，除必要字段外都可以为null
+    TEXT_FIELDS = ('title', 'username', 'password', 'url', 'category', 'notes', 'platform', 'createdAt')
+    
+    # 批量写入的结果状态
+    RESULT_CREATED = 'created'
+    RESULT_UPDATED = 'updated'
+    RESULT_DELETED = 'deleted'
+    RESULT_ERROR = 'error'
+    
+    # FTS5搜索索引是否可用，首次搜索时检查
+    _search_index_available = None
+    
+
+    def __init__(self, id, user_id, title, username, password, category, url='', notes='', platform='', created_at=None, updated_at=None, revision=0, version=1):
         self.id = id
         self.user_id = user_id
         self.title = title
@@ -12,8 +336,15 @@ class Password:
         self.category = category
         self.notes = notes
         self.platform = platform
-        self.created_at = created_at or datetime.now().isoformat()
-        self.updated_at = updated_at or datetime.now().isoformat()
+        # 只在缺少时间戳时才取当前时间
+        if created_at is None or updated_at is None:
+            now = datetime.now().isoformat()
+            created_at = created_at or now
+            updated_at = updated_at or now
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.revision = revision
+        self.version = version
     
     def to_dict(self):
         """转换为字典格式"""
@@ -28,133 +359,501 @@ class Password:
             'notes': self.notes or '',
             'platform': self.platform or '',
             'createdAt': self.created_at,
-            'updatedAt': self.updated_at
+            'updatedAt': self.updated_at,
+            'version': self.version
         }
     
     @classmethod
-    def get_all(cls, user_id):
-        """获取特定用户的所有密码"""
-        query = 'SELECT * FROM passwords WHERE user_id = ? ORDER BY category, title'
-        rows = Database.execute_query(query, (user_id,))
+    def get_all_json(cls, user_id, fields=None):
+        """获取特定用户的所有密码，直接返回JSON数组文本
+        
+        Args:
+            user_id (str): 用户ID
+            fields (list[str], optional): 只返回这些字段（id始终返回），默认返回全部字段
+        """
+        projection = get_projection(fields)
+        return projection.serializer.dumps_rows(Database.fetch_all(projection.list_statement, (user_id,)))
+    
+    @classmethod
+    def get_page(cls, user_id, limit, after=None, fields=None):
+        """键集分页获取特定用户的密码，按(category, title, id)排序
+        
+        Args:
+            user_id (str): 用户ID
+            limit (int): 每页条数
+            after (str, optional): 上一页返回的游标，为空时从第一页开始
+            fields (list[str], optional): 只返回这些字段（id始终返回），默认返回全部字段
+            
+        Returns:
+            tuple: (元组行列表, 下一页游标)，没有更多数据时游标为None
+            
+        Raises:
+            InvalidCursorError: 游标无效
+        """
+        projection = get_projection(fields)
+        # 多取一行用于判断是否还有下一页
+        if after:
+            category, title, password_id = decode_cursor(after, len(SORT_COLUMNS))
+            rows = Database.fetch_all(projection.after_statement, (user_id, category, title, password_id, limit + 1))
+        else:
+            rows = Database.fetch_all(projection.first_statement, (user_id, limit + 1))
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor([last[index] for index in projection.sort_key_indexes])
+        return rows, next_cursor
+    
+    @classmethod
+    def get_page_json(cls, user_id, limit, after=None, fields=None):
+        """键集分页获取特定用户的密码，直接返回JSON文本 {"items": [...], "nextCursor": ...}"""
+        rows, next_cursor = cls.get_page(user_id, limit, after, fields)
+        serializer = get_projection(fields).serializer
+        return '{"items":' + serializer.dumps_rows(rows) + ',"nextCursor":' + encode_value(next_cursor) + '}'
+    
+    @classmethod
+    def export_ndjson(cls, user_id, batch_size=500):
+        """流式导出特定用户的所有密码，每行一个JSON对象（NDJSON）
         
-        return [cls(
-            row['id'],
-            row['user_id'],
-            row['title'],
-            row['username'],
-            row['password'],
-            row['category'],
-            row['url'],
-            row['notes'],
-            (row['platform'] if 'platform' in row else ''),
-            row['created_at'],
-            row['updated_at']
-        ).to_dict() for row in rows]
+        按批次从游标读取并输出，内存占用与密码库大小无关
+        
+        Yields:
+            str: 一批记录对应的NDJSON文本
+        """
+        projection = get_projection()
+        dumps_row = projection.serializer.dumps_row
+        lines = []
+        for row in Database.iter_rows(projection.list_statement, (user_id,), batch_size):
+            lines.append(dumps_row(row))
+            if len(lines) >= batch_size:
+                lines.append('')
+                yield '\n'.join(lines)
+                lines = []
+        if lines:
+            lines.append('')
+            yield '\n'.join(lines)
     
     @classmethod
     def get_by_id(cls, password_id, user_id):
         """根据ID获取密码，确保只能访问自己的密码"""
-        query = 'SELECT * FROM passwords WHERE id = ? AND user_id = ?'
-        rows = Database.execute_query(query, (password_id, user_id))
-        
-        if rows:
-            row = rows[0]
-            return cls(
-                row['id'],
-                row['user_id'],
-                row['title'],
-                row['username'],
-                row['password'],
-                row['category'],
-                row['url'],
-                row['notes'],
-                (row['platform'] if 'platform' in row else ''),
-                row['created_at'],
-                row['updated_at']
-            ).to_dict()
-        return None
+        return Database.fetch_one('passwords.get_by_id', (password_id, user_id))
     
     @classmethod
-    def create(cls, password_data):
-        """创建新密码"""
-        password = cls(
-            password_data['id'],
-            password_data['userId'],
-            password_data['title'],
-            password_data['username'],
-            password_data['password'],
-            password_data['category'],
-            password_data.get('url', ''),
-            password_data.get('notes', ''),
-            password_data.get('platform', ''),
-            password_data.get('createdAt'),
-            datetime.now().isoformat()
-        )
+    def get_categories(cls, user_id):
+        """获取用户的分类及每个分类下的密码数量
         
-        query = '''
-            INSERT INTO passwords (
-                id, user_id, title, username, password, url, 
-                category, notes, platform, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        '''
-        
-        params = (
-            password.id,
-            password.user_id,
-            password.title,
-            password.username,
-            password.password,
-            password.url,
-            password.category,
-            password.notes,
-            password.platform,
-            password.created_at,
-            password.updated_at
-        )
+        结果按用户缓存，并记录计算时的密码库修订号；修订号变化（有写入）后缓存自动失效，
+        多进程部署时同样有效
+        
+        Returns:
+            tuple: ([{'name': 分类, 'count': 数量}], 密码库修订号)
+        """
+        with Database.transaction(immediate=False):
+            revision = VaultRevision.get(user_id)
+            cached = _category_cache.get(user_id)
+            if cached is not None and cached[0] == revision:
+                return cached[1], revision
+            
+            rows = Database.fetch_all('passwords.category_counts', (user_id,))
+        categories = [{'name': category, 'count': count} for category, count in rows]
+        _category_cache.set(user_id, (revision, categories))
+        return categories, revision
+    
+    @classmethod
+    def has_search_index(cls):
+        """FTS5搜索索引是否可用，结果在进程内缓存"""
+        if cls._search_index_available is None:
+            cls._search_index_available = bool(Database.fetch_one('passwords.search_index_exists'))
+        return cls._search_index_available
+    
+    @classmethod
+    def search(cls, user_id, terms, limit):
+        """按标题、用户名、网址、平台、分类搜索密码
         
-        return Database.execute_query(query, params, commit=True)
-    
-    @classmethod
-    def update(cls, password_id, password_data):
-        """更新密码，确保只能更新自己的密码"""
-        # 先获取现有密码
-        existing_password = cls.get_by_id(password_id, password_data['userId'])
-        if not existing_password:
-            return False
-        
-        # 更新字段
-        updated_at = datetime.now().isoformat()
-        
-        query = '''
-            UPDATE passwords SET 
-                title = ?, username = ?, password = ?, url = ?, 
-                category = ?, notes = ?, platform = ?, updated_at = ? 
-            WHERE id = ? AND user_id = ?
-        '''
-        
-        params = (
-            password_data.get('title', existing_password['title']),
-            password_data.get('username', existing_password['username']),
-            password_data.get('password', existing_password['password']),
-            password_data.get('url', existing_password['url']),
-            password_data.get('category', existing_password['category']),
-            password_data.get('notes', existing_password['notes']),
-            password_data.get('platform', existing_password['platform']),
-            updated_at,
-            password_id,
-            password_data['userId']
+        每个关键词做前缀匹配，所有关键词都命中的记录才返回。
+        有FTS5索引时按bm25相关度排序（标题权重最高），否则退回LIKE子串匹配并按分类、标题排序
+        
+        Args:
+            user_id (str): 用户ID
+            terms (list[str]): 关键词
+            limit (int): 最多返回条数
+            
+        Returns:
+            list[tuple]: 元组行，列顺序与OUTPUT_FIELDS一致
+        """
+        if cls.has_search_index():
+            return Database.fetch_all('passwords.search', (build_match_query(user_id, terms), user_id, limit))
+        
+        params = [user_id]
+        for term in terms:
+            pattern = '%' + escape_like(term) + '%'
+            params.extend([pattern] * len(SEARCH_FIELD_COLUMNS))
+        params.append(limit)
+        return Database.fetch_all(get_like_search_statement(len(terms)), params)
+    
+    @classmethod
+    def search_json(cls, user_id, terms, limit):
+        """搜索密码，直接返回JSON文本 {"items": [...]}"""
+        rows = cls.search(user_id, terms, limit)
+        return '{"items":' + get_projection().serializer.dumps_rows(rows) + '}'
+    
+    @classmethod
+    def get_changes_json(cls, user_id, since):
+        """获取指定修订号之后的变更，直接返回JSON文本
+        
+        {"revision": 当前修订号, "items": [创建或更新的记录], "deleted": [墓碑]}
+        
+        客户端保存返回的revision，下次以它作为since请求，即可只同步这之后的变更；
+        since为0时返回全部记录
+        
+        Args:
+            user_id (str): 用户ID
+            since (int): 客户端已同步到的修订号
+            
+        Returns:
+            tuple: (JSON文本, 当前修订号)
+        """
+        # 修订号、记录和墓碑在同一个读事务中读取，三者对应同一个快照
+        with Database.transaction(immediate=False):
+            revision = VaultRevision.get(user_id)
+            items = Database.fetch_all('passwords.changed_since', (user_id, since))
+            deleted = Database.fetch_all('password_tombstones.since', (user_id, since))
+        body = (
+            '{"revision":' + str(revision)
+            + ',"items":' + CHANGE_SERIALIZER.dumps_rows(items)
+            + ',"deleted":' + TOMBSTONE_SERIALIZER.dumps_rows(deleted) + '}'
         )
+        return body, revision
+    
+    @classmethod
+    def save(cls, password_data, expected_version=None):
+        """创建或更新密码，通过一条UPSERT语句完成
+        
+        ID不存在时创建；已存在且属于当前用户时整体更新（未提供的可选字段保持原值）。
+        提供expected_version时只更新已有记录：记录不存在（可能已被其他客户端删除）
+        视为版本冲突，不会重新创建
+        
+        Args:
+            password_data (dict): 密码数据，必须包含userId和REQUIRED_FIELDS
+            expected_version (int, optional): 期望的当前版本号（来自If-Match），为None时不检查
+            
+        Returns:
+            int: 写入后的版本号，ID已被其他用户占用时返回None
+            
+        Raises:
+            VersionConflictError: 当前版本号与expected_version不一致，或记录已不存在
+        """
+        user_id = password_data['userId']
+        now = datetime.now().isoformat()
+        with Database.transaction():
+            # 处于写事务中，修订号不会被其他连接修改，只有写入成功时才真正更新修订号
+            revision = VaultRevision.get(user_id) + 1
+            if expected_version is not None:
+                params = (
+                    password_data['title'],
+                    password_data['username'],
+                    password_data['password'],
+                    password_data.get('url'),
+                    password_data['category'],
+                    password_data.get('notes'),
+                    password_data.get('platform'),
+                    now,
+                    revision,
+                    password_data['id'],
+                    user_id,
+                    expected_version,
+                    expected_version
+                )
+                version = Database.fetch_one('passwords.update_checked', params)
+                if version is None:
+                    cls._raise_if_version_conflict(password_data['id'], user_id, expected_version, missing_is_conflict=True)
+                    return None
+                
+                VaultRevision.bump(user_id)
+                return version
+            
+            params = (
+                password_data['id'],
+                user_id,
+                password_data['title'],
+                password_data['username'],
+                password_data['password'],
+                password_data.get('url'),
+                password_data['category'],
+                password_data.get('notes'),
+                password_data.get('platform'),
+                password_data.get('createdAt') or now,
+                now,
+                revision
+            )
+            version = Database.fetch_one('passwords.upsert', params)
+            if version is None:
+                return None
+            
+            VaultRevision.bump(user_id)
+            if version == 1:
+                # 新建的记录，清除同ID的墓碑
+                Database.execute('password_tombstones.delete', (user_id, password_data['id']))
+            return version
+    
+    @classmethod
+    def update(cls, password_id, password_data, expected_version=None):
+        """更新密码，确保只能更新自己的密码，未提供的字段保持原值
         
-        return Database.execute_query(query, params, commit=True)
+        Args:
+            password_id (str): 密码ID
+            password_data (dict): 要更新的字段，必须包含userId
+            expected_version (int, optional): 期望的当前版本号（来自If-Match），为None时不检查
+            
+        Returns:
+            int: 更新后的版本号，密码不存在时返回None
+            
+        Raises:
+            VersionConflictError: 当前版本号与expected_version不一致
+        """
+        user_id = password_data['userId']
+        with Database.transaction():
+            # 处于写事务中，修订号不会被其他连接修改，只有更新成功时才真正更新修订号
+            revision = VaultRevision.get(user_id) + 1
+            params = (
+                password_data.get('title'),
+                password_data.get('username'),
+                password_data.get('password'),
+                password_data.get('url'),
+                password_data.get('category'),
+                password_data.get('notes'),
+                password_data.get('platform'),
+                datetime.now().isoformat(),
+                revision,
+                password_id,
+                user_id,
+                expected_version,
+                expected_version
+            )
+            version = Database.fetch_one('passwords.update_checked', params)
+            if version is None:
+                cls._raise_if_version_conflict(password_id, user_id, expected_version)
+                return None
+            
+            VaultRevision.bump(user_id)
+            return version
+    
+    @classmethod
+    def _raise_if_version_conflict(cls, password_id, user_id, expected_version, missing_is_conflict=False):
+        """写入没有生效时检查原因，记录属于当前用户但版本不一致时抛出VersionConflictError
+        
+        missing_is_conflict为True时，记录不存在也抛出（current_version为None）
+        """
+        if expected_version is None:
+            return
+        row = Database.fetch_one('passwords.get_owner_version', (password_id,))
+        if row is None:
+            if missing_is_conflict:
+                raise VersionConflictError(password_id, None)
+        elif row['user_id'] == user_id:
+            raise VersionConflictError(password_id, row['version'])
     
     @classmethod
     def delete(cls, password_id, user_id):
-        """删除密码，确保只能删除自己的密码"""
-        query = 'DELETE FROM passwords WHERE id = ? AND user_id = ?'
-        return Database.execute_query(query, (password_id, user_id), commit=True)
+        """删除密码，确保只能删除自己的密码，同时记录墓碑供增量同步使用
+        
+        Returns:
+            bool: 删除成功返回True，密码不存在时返回False
+        """
+        with Database.transaction():
+            deleted = Database.execute('passwords.delete', (password_id, user_id))
+            if deleted:
+                revision = VaultRevision.bump(user_id)
+                Database.execute('password_tombstones.insert', (password_id, user_id, revision, datetime.now().isoformat()))
+            return deleted > 0
     
     @classmethod
     def delete_by_user_id(cls, user_id):
-        """删除指定用户的所有密码"""
+        """删除指定用户的所有密码，同时为每条记录留下墓碑"""
         query = 'DELETE FROM passwords WHERE user_id = ?'
-        return Database.execute_query(query, (user_id,), commit=True)
+        with Database.transaction():
+            revision = VaultRevision.bump(user_id)
+            Database.execute('password_tombstones.insert_for_user', (revision, datetime.now().isoformat(), user_id))
+            return Database.execute_query(query, (user_id,), commit=True)
+    
+    @classmethod
+    def delete_tombstones_by_user_id(cls, user_id):
+        """删除指定用户的所有墓碑记录（删除用户时调用）"""
+        return Database.execute('password_tombstones.delete_by_user', (user_id,))
+    
+    @classmethod
+    def _get_owners(cls, password_ids):
+        """批量查询密码ID的归属用户
+        
+        Returns:
+            dict: {密码ID: 用户ID}，不存在的ID不在结果中
+        """
+        owners = {}
+        password_ids = list(dict.fromkeys(password_ids))
+        for start in range(0, len(password_ids), LOOKUP_CHUNK_SIZE):
+            chunk = password_ids[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = Database.execute_query(f'SELECT id, user_id FROM passwords WHERE id IN ({placeholders})', chunk)
+            for row in rows:
+                owners[row['id']] = row['user_id']
+        return owners
+    
+    @classmethod
+    def validate_item(cls, item, creating):
+        """校验单条写入数据的字段类型，避免错误数据在批量语句中导致整个事务失败
+        
+        Args:
+            item (dict): 密码数据（camelCase）
+            creating (bool): 是否为创建；创建时必要字段不能为null，更新时null表示保持原值
+            
+        Returns:
+            str: 错误信息，校验通过时返回None
+        """
+        if creating:
+            for field in cls.REQUIRED_FIELDS:
+                if item.get(field) is None:
+                    return f'Missing required field: {field}'
+        for field in cls.TEXT_FIELDS:
+            value = item.get(field)
+            if value is not None and not isinstance(value, str):
+                return f'Invalid field type: {field} must be a string'
+        return None
+    
+    @classmethod
+    def bulk_upsert(cls, user_id, items, modes=None):
+        """批量创建或更新密码
+        
+        所有写入在同一事务中通过executemany完成，只提交一次。
+        某一项校验失败不影响其他项，结果按items的顺序逐项返回。
+        
+        Args:
+            user_id (str): 当前用户ID
+            items (list[dict]): 密码数据，字段与单条接口一致（camelCase）
+            modes (list[str], optional): 与items一一对应的写入模式，
+                'create'（仅创建）、'update'（仅更新）或'upsert'（默认，存在则更新否则创建）
+                
+        Returns:
+            list[dict]: 每项的结果，如 {'id': 'xxx', 'status': 'created'}，
+                失败时status为'error'并带有error字段
+        """
+        results = []
+        inserts = []
+        updates = []
+        now = datetime.now().isoformat()
+        
+        with Database.transaction():
+            # 整个批次共用一个修订号，只在确实有写入时才更新
+            revision = None
+            owners = cls._get_owners(
+                item['id'] for item in items if isinstance(item, dict) and isinstance(item.get('id'), str) and item['id']
+            )
+            
+            for index, item in enumerate(items):
+                mode = modes[index] if modes else 'upsert'
+                password_id = item.get('id') if isinstance(item, dict) else None
+                if not password_id:
+                    results.append({'id': password_id, 'status': cls.RESULT_ERROR, 'error': 'Missing required field: id'})
+                    continue
+                if not isinstance(password_id, str):
+                    results.append({'id': None, 'status': cls.RESULT_ERROR, 'error': 'Invalid field type: id must be a string'})
+                    continue
+                
+                owner = owners.get(password_id)
+                if owner is not None and owner != user_id:
+                    # ID已被其他用户占用，不能覆盖
+                    results.append({'id': password_id, 'status': cls.RESULT_ERROR, 'error': 'Password id already in use'})
+                    continue
+                
+                if owner is None:
+                    if mode == 'update':
+                        results.append({'id': password_id, 'status': cls.RESULT_ERROR, 'error': 'Password not found'})
+                        continue
+                    error = cls.validate_item(item, creating=True)
+                    if error:
+                        results.append({'id': password_id, 'status': cls.RESULT_ERROR, 'error': error})
+                        continue
+                    if revision is None:
+                        revision = VaultRevision.bump(user_id)
+                    inserts.append((
+                        password_id,
+                        user_id,
+                        item['title'],
+                        item['username'],
+                        item['password'],
+                        item.get('url', ''),
+                        item['category'],
+                        item.get('notes', ''),
+                        item.get('platform', ''),
+                        item.get('createdAt') or now,
+                        now,
+                        revision
+                    ))
+                    # 同一批次中后续出现的相同ID按更新处理
+                    owners[password_id] = user_id
+                    results.append({'id': password_id, 'status': cls.RESULT_CREATED})
+                else:
+                    if mode == 'create':
+                        results.append({'id': password_id, 'status': cls.RESULT_ERROR, 'error': 'Password already exists'})
+                        continue
+                    error = cls.validate_item(item, creating=False)
+                    if error:
+                        results.append({'id': password_id, 'status': cls.RESULT_ERROR, 'error': error})
+                        continue
+                    if revision is None:
+                        revision = VaultRevision.bump(user_id)
+                    updates.append((
+                        item.get('title'),
+                        item.get('username'),
+                        item.get('password'),
+                        item.get('url'),
+                        item.get('category'),
+                        item.get('notes'),
+                        item.get('platform'),
+                        now,
+                        revision,
+                        password_id,
+                        user_id
+                    ))
+                    results.append({'id': password_id, 'status': cls.RESULT_UPDATED})
+            
+            # 先插入再更新，保证同一批次中先创建后修改的顺序
+            if inserts:
+                Database.execute_many('passwords.insert', inserts)
+                Database.execute_many('password_tombstones.delete', [(user_id, row[0]) for row in inserts])
+            if updates:
+                Database.execute_many('passwords.update_partial', updates)
+        
+        return results
+    
+    @classmethod
+    def bulk_delete(cls, user_id, password_ids):
+        """批量删除密码，只能删除自己的密码
+        
+        Returns:
+            list[dict]: 每个ID的结果，不存在或不属于当前用户时status为'error'
+        """
+        results = []
+        deletes = []
+        
+        with Database.transaction():
+            owners = cls._get_owners(pid for pid in password_ids if pid)
+            for password_id in password_ids:
+                if not password_id or owners.get(password_id) != user_id:
+                    results.append({'id': password_id, 'status': cls.RESULT_ERROR, 'error': 'Password not found'})
+                    continue
+                # 同一批次中重复的ID只删除一次
+                owners.pop(password_id)
+                deletes.append((password_id, user_id))
+                results.append({'id': password_id, 'status': cls.RESULT_DELETED})
+            
+            if deletes:
+                Database.execute_many('passwords.delete', deletes)
+                revision = VaultRevision.bump(user_id)
+                deleted_at = datetime.now().isoformat()
+                Database.execute_many(
+                    'password_tombstones.insert',
+                    [(password_id, user_id, revision, deleted_at) for password_id, _ in deletes]
+                )
+        
+        return results
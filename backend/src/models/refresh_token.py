@@ -0,0 +1,154 @@
+import os
+import uuid
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from utils.db import Database
+from config.config import config
+
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+
+class RefreshTokenError(Exception):
+    """刷新令牌无效（不存在、已过期、已撤销或IP不匹配）"""
+    pass
+
+
+class RefreshTokenReuseError(RefreshTokenError):
+    """已轮换过的刷新令牌被再次使用，可能已泄露，整个family已被撤销"""
+    pass
+
+
+class RefreshToken:
+    """刷新令牌
+
+    - 令牌为随机字符串，数据库只保存其SHA-256摘要
+    - 每次刷新都会作废旧令牌并签发新令牌（轮换），新令牌的有效期重新计算（滑动会话），
+      但不超过该次登录的最长时长
+    - 同一次登录轮换出的所有令牌属于同一个family，已轮换的令牌再次被使用时，
+      说明令牌可能已被窃取，撤销整个family，持有者需要重新登录
+    """
+
+    @staticmethod
+    def hash_token(token):
+        """计算令牌摘要"""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def issue(cls, user_id, ip_address=None, family_id=None, session_expires_at=None):
+        """签发刷新令牌
+
+        Args:
+            user_id (str): 用户ID
+            ip_address (str, optional): 令牌绑定的IP地址
+            family_id (str, optional): 轮换时沿用旧令牌的family，登录时为None
+            session_expires_at (str, optional): 会话最长有效期，登录时根据配置计算
+
+        Returns:
+            str: 刷新令牌原文，只在此时返回一次
+        """
+        now = datetime.now()
+        if family_id is None:
+            family_id = str(uuid.uuid4())
+        if session_expires_at is None:
+            session_expires_at = (now + timedelta(days=current_config.REFRESH_TOKEN_MAX_LIFETIME_DAYS)).isoformat()
+        expires_at = min((now + timedelta(days=current_config.REFRESH_TOKEN_EXPIRE_DAYS)).isoformat(), session_expires_at)
+
+        token = secrets.token_urlsafe(32)
+        with Database.transaction():
+            # 顺便清理该用户已过期的令牌（已轮换但未过期的令牌需要保留，用于重用检测）
+            Database.execute('refresh_tokens.delete_expired_by_user', (user_id, now.isoformat()))
+            Database.execute('refresh_tokens.insert', (
+                cls.hash_token(token), family_id, user_id, ip_address,
+                expires_at, session_expires_at, now.isoformat()
+            ))
+        return token
+
+    @classmethod
+    def rotate(cls, token, ip_address=None):
+        """使用刷新令牌换取新的刷新令牌
+
+        Args:
+            token (str): 客户端提交的刷新令牌
+            ip_address (str, optional): 当前请求的IP地址
+
+        Returns:
+            tuple: (用户ID, 新的刷新令牌)
+
+        Raises:
+            RefreshTokenReuseError: 令牌已被轮换过，整个family已被撤销
+            RefreshTokenError: 令牌无效
+        """
+        now = datetime.now().isoformat()
+        with Database.transaction():
+            row = Database.fetch_one('refresh_tokens.get', (cls.hash_token(token),))
+            if row is None or row['revoked_at'] is not None:
+                raise RefreshTokenError('Invalid refresh token')
+
+            reused = row['used_at'] is not None
+            if reused:
+                # 撤销需要提交，异常在事务结束后再抛出
+                Database.execute('refresh_tokens.revoke_family', (now, row['family_id']))
+            elif row['expires_at'] <= now:
+                raise RefreshTokenError('Refresh token has expired')
+            elif row['ip_address'] != ip_address:
+                raise RefreshTokenError('IP address mismatch')
+            else:
+                # 写事务中再次确认未被并发使用
+                if not Database.execute('refresh_tokens.mark_used', (now, row['token_hash'])):
+                    raise RefreshTokenError('Invalid refresh token')
+                new_token = cls.issue(row['user_id'], ip_address, row['family_id'], row['session_expires_at'])
+
+        if reused:
+            raise RefreshTokenReuseError('Refresh token reuse detected')
+        return row['user_id'], new_token
+
+    @classmethod
+    def revoke(cls, token):
+        """撤销刷新令牌所在的整个family（退出登录）
+
+        Returns:
+            bool: 令牌存在时返回True
+        """
+        with Database.transaction():
+            row = Database.fetch_one('refresh_tokens.get', (cls.hash_token(token),))
+            if row is None:
+                return False
+            Database.execute('refresh_tokens.revoke_family', (datetime.now().isoformat(), row['family_id']))
+            return True
+
+    @classmethod
+    def revoke_user(cls, user_id):
+        """撤销用户所有的刷新令牌（修改主密码时调用）"""
+        return Database.execute('refresh_tokens.revoke_user', (datetime.now().isoformat(), user_id))
+
+    @classmethod
+    def delete_by_user_id(cls, user_id):
+        """删除用户的所有刷新令牌（删除用户时调用）"""
+        return Database.execute('refresh_tokens.delete_by_user', (user_id,))
+
+
+Database.register(
+    'refresh_tokens.insert',
+    '''
+        INSERT INTO refresh_tokens (
+            token_hash, family_id, user_id, ip_address, expires_at, session_expires_at, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+)
+Database.register('refresh_tokens.get', 'SELECT * FROM refresh_tokens WHERE token_hash = ?')
+Database.register(
+    'refresh_tokens.mark_used',
+    'UPDATE refresh_tokens SET used_at = ? WHERE token_hash = ? AND used_at IS NULL AND revoked_at IS NULL'
+)
+Database.register(
+    'refresh_tokens.revoke_family',
+    'UPDATE refresh_tokens SET revoked_at = ? WHERE family_id = ? AND revoked_at IS NULL'
+)
+Database.register(
+    'refresh_tokens.revoke_user',
+    'UPDATE refresh_tokens SET revoked_at = ? WHERE user_id = ? AND revoked_at IS NULL'
+)
+Database.register('refresh_tokens.delete_expired_by_user', 'DELETE FROM refresh_tokens WHERE user_id = ? AND expires_at < ?')
+Database.register('refresh_tokens.delete_by_user', 'DELETE FROM refresh_tokens WHERE user_id = ?')
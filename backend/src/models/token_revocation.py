@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+from datetime import datetime
+from utils.db import Database
+from config.config import config
+from utils.log import Logger
+
+# 初始化日志
+logger = Logger.get_logger('token_revocation')
+
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+
+class TokenRevocation:
+    """访问令牌撤销列表
+
+    撤销记录持久化在token_revocations表中（只追加），每个进程在内存中维护：
+    - 已撤销的jti集合：{jti: 过期时间}
+    - 每个用户的水位线：{用户ID: 时间戳}，在此之前及同一秒内签发的令牌全部失效
+
+    检查令牌时只查内存，为常数时间；内存每隔TOKEN_REVOCATION_SYNC_INTERVAL秒
+    按seq从表中增量同步一次，其他进程的撤销最迟在一个同步间隔后生效，
+    本进程的撤销立即生效
+    """
+
+    _lock = threading.Lock()
+    _revoked_jtis = {}
+    _watermarks = {}
+    _last_seq = 0
+    _next_sync = 0.0
+
+    @classmethod
+    def revoke_token(cls, jti, user_id, expires_at):
+        """撤销单个令牌
+
+        Args:
+            jti (str): 令牌ID
+            user_id (str): 用户ID
+            expires_at (int): 令牌过期时间（Unix时间戳），之后记录可以清理
+        """
+        Database.execute('token_revocations.insert', (
+            jti, user_id, None, int(expires_at), datetime.now().isoformat()
+        ))
+        with cls._lock:
+            cls._revoked_jtis[jti] = int(expires_at)
+        cls.cleanup_expired()
+
+    @classmethod
+    def revoke_user_tokens(cls, user_id):
+        """撤销用户当前所有的访问令牌（修改主密码等场景）"""
+        now = int(time.time())
+        # 水位线之前签发的令牌最迟在一个令牌有效期后全部过期
+        expires_at = now + current_config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        Database.execute('token_revocations.insert', (
+            None, user_id, now, expires_at, datetime.now().isoformat()
+        ))
+        with cls._lock:
+            if now > cls._watermarks.get(user_id, (0, 0))[0]:
+                cls._watermarks[user_id] = (now, expires_at)
+        cls.cleanup_expired()
+
+    @classmethod
+    def is_revoked(cls, jti, user_id, issued_at):
+        """检查令牌是否已被撤销
+
+        Args:
+            jti (str): 令牌ID，旧令牌可能没有
+            user_id (str): 用户ID
+            issued_at (int): 令牌签发时间（Unix时间戳）
+        """
+        if time.monotonic() >= cls._next_sync:
+            cls.sync()
+        if jti is not None and jti in cls._revoked_jtis:
+            return True
+        # iat精度为秒，无法区分同一秒内撤销前后签发的令牌，按已撤销处理；
+        # 撤销后同一秒内重新登录拿到的令牌也会失效，需要再登录一次
+        watermark = cls._watermarks.get(user_id)
+        return watermark is not None and issued_at <= watermark[0]
+
+    @classmethod
+    def sync(cls):
+        """从数据库增量同步撤销记录，同时清理内存中已过期的记录"""
+        with cls._lock:
+            # 其他线程已经同步过
+            if time.monotonic() < cls._next_sync:
+                return
+            now = int(time.time())
+            try:
+                rows = Database.fetch_all('token_revocations.since', (cls._last_seq, now))
+            except Exception as e:
+                # 同步失败时继续使用内存中的数据，下个间隔再试
+                logger.error(f"同步令牌撤销记录失败: {str(e)}")
+                cls._next_sync = time.monotonic() + current_config.TOKEN_REVOCATION_SYNC_INTERVAL
+                return
+
+            for seq, jti, user_id, issued_before, expires_at in rows:
+                if jti is not None:
+                    cls._revoked_jtis[jti] = expires_at
+                elif issued_before > cls._watermarks.get(user_id, (0, 0))[0]:
+                    cls._watermarks[user_id] = (issued_before, expires_at)
+                cls._last_seq = max(cls._last_seq, seq)
+
+            cls._revoked_jtis = {jti: exp for jti, exp in cls._revoked_jtis.items() if exp > now}
+            cls._watermarks = {uid: mark for uid, mark in cls._watermarks.items() if mark[1] > now}
+            cls._next_sync = time.monotonic() + current_config.TOKEN_REVOCATION_SYNC_INTERVAL
+
+    @classmethod
+    def cleanup_expired(cls):
+        """删除已过期的撤销记录，相关令牌都已自然过期"""
+        return Database.execute('token_revocations.delete_expired', (int(time.time()),))
+
+
+Database.register(
+    'token_revocations.insert',
+    '''
+        INSERT INTO token_revocations (jti, user_id, issued_before, expires_at, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+)
+# 按seq顺序读取新增的、尚未过期的记录
+Database.register(
+    'token_revocations.since',
+    '''
+        SELECT seq, jti, user_id, issued_before, expires_at FROM token_revocations
+        WHERE seq > ? AND expires_at > ? ORDER BY seq
+    '''
+)
+Database.register('token_revocations.delete_expired', 'DELETE FROM token_revocations WHERE expires_at <= ?')
@@ -1,16 +1,40 @@
+import os
+import hmac
 from datetime import datetime
 import bcrypt
-from utils.db import Database
+from utils.db import Database, model_row_factory, scalar_row_factory
+from utils.kdf_pool import get_kdf_pool
+from utils.cache import LRUCache
+from config.config import config
+
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+# 邀请码到盐值的缓存：{邀请码: 盐值}，未知邀请码缓存为None（负缓存）
+_salt_cache = LRUCache(current_config.AUTH_SALT_CACHE_SIZE, ttl=current_config.AUTH_SALT_CACHE_TTL)
+# 区分"未命中"和"负缓存"
+_MISSING = object()
+
+# 查询列，顺序与User.__init__的参数一致
+USER_COLUMNS = 'id, username, password_hash, salt, invite_code, created_at, updated_at, kdf_iterations'
 
 class User:
-    def __init__(self, id, username, password_hash, salt, invite_code, created_at=None, updated_at=None):
+    __slots__ = ('id', 'username', 'password_hash', 'salt', 'invite_code', 'created_at', 'updated_at', 'kdf_iterations')
+    
+    def __init__(self, id, username, password_hash, salt, invite_code, created_at=None, updated_at=None, kdf_iterations=10000):
         self.id = id
         self.username = username
         self.password_hash = password_hash
         self.salt = salt
         self.invite_code = invite_code
-        self.created_at = created_at or datetime.now().isoformat()
-        self.updated_at = updated_at or datetime.now().isoformat()
+        # 只在缺少时间戳时才取当前时间
+        if created_at is None or updated_at is None:
+            now = datetime.now().isoformat()
+            created_at = created_at or now
+            updated_at = updated_at or now
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.kdf_iterations = kdf_iterations
     
     def to_dict(self):
         """转换为字典格式"""
@@ -28,68 +52,80 @@ class User:
         return salt
 
     @classmethod
-    def hash_password(cls, password, salt=None):
-        """使用PBKDF2算法生成哈希值，与前端保持一致"""
-        from utils.hash import pbkdf2_hash
+    def hash_password(cls, password, salt=None, iterations=None):
+        """使用PBKDF2算法生成哈希值，与前端保持一致
+        
+        计算在密钥派生线程池中进行，线程池已满时抛出KdfPoolBusyError
         
+        Args:
+            password (str): 明文密码
+            salt (str, optional): 盐值，默认生成新的盐值
+            iterations (int, optional): 迭代次数，默认使用KDF_DEFAULT_ITERATIONS
+        """
         if salt is None:
             salt = cls.generate_salt()
+        if iterations is None:
+            iterations = current_config.KDF_DEFAULT_ITERATIONS
         
         # 为哈希派生添加固定后缀，与加密密钥区分，保持与前端一致
         hash_input = f"{password}{salt}hash"
         
         # 使用PBKDF2算法生成哈希值，key_length=64字节（512位），与前端保持一致
-        return pbkdf2_hash(hash_input, salt, iterations=10000, key_length=64)
+        return get_kdf_pool().pbkdf2_hash(hash_input, salt, iterations, 64)
     
     def verify_password(self, password):
-        """验证密码"""
-        from utils.hash import pbkdf2_hash
-        
-        # 为哈希派生添加固定后缀，与加密密钥区分，保持与前端一致
-        hash_input = f"{password}{self.salt}hash"
-        
-        # 使用相同的PBKDF2算法生成哈希值，key_length=64字节（512位），与前端保持一致
-        generated_hash = pbkdf2_hash(hash_input, self.salt, iterations=10000, key_length=64)
+        """验证密码，使用该用户自己的迭代次数
         
-        return generated_hash == self.password_hash
+        计算在密钥派生线程池中进行，线程池已满时抛出KdfPoolBusyError
+        """
+        generated_hash = self.hash_password(password, self.salt, self.kdf_iterations)
+        return hmac.compare_digest(generated_hash, self.password_hash)
     
     @classmethod
     def get_by_username(cls, username):
         """根据用户名获取用户"""
-        query = 'SELECT * FROM users WHERE username = ?'
-        rows = Database.execute_query(query, (username,))
-        
-        if rows:
-            row = rows[0]
-            return cls(
-                row['id'],
-                row['username'],
-                row['password_hash'],
-                row['salt'],
-                row['invite_code'],
-                row['created_at'],
-                row['updated_at']
-            )
-        return None
+        return Database.fetch_one('users.get_by_username', (username,))
     
     @classmethod
     def get_by_id(cls, user_id):
         """根据ID获取用户"""
-        query = 'SELECT * FROM users WHERE id = ?'
-        rows = Database.execute_query(query, (user_id,))
-        
-        if rows:
-            row = rows[0]
-            return cls(
-                row['id'],
-                row['username'],
-                row['password_hash'],
-                row['salt'],
-                row['invite_code'],
-                row['created_at'],
-                row['updated_at']
-            )
-        return None
+        return Database.fetch_one('users.get_by_id', (user_id,))
+    
+    @classmethod
+    def get_by_credentials(cls, password_hash, invite_code):
+        """根据派生哈希值和邀请码获取用户（登录）"""
+        return Database.fetch_one('users.get_by_credentials', (password_hash, invite_code))
+    
+    # 盐值缓存的失效计数，查询期间发生过失效时不写入缓存，避免写回旧盐值
+    _salt_cache_generation = 0
+    
+    @classmethod
+    def get_salt_by_invite_code(cls, invite_code):
+        """根据邀请码获取用户的盐值，未找到时返回None
+        
+        结果按邀请码缓存，未知邀请码也缓存较短时间，登录前的获取盐值请求大多不访问数据库
+        """
+        if not current_config.AUTH_SALT_CACHE_SIZE:
+            return Database.fetch_one('users.salt_by_invite_code', (invite_code,))
+        
+        salt = _salt_cache.get(invite_code, _MISSING)
+        if salt is not _MISSING:
+            return salt
+        
+        generation = cls._salt_cache_generation
+        salt = Database.fetch_one('users.salt_by_invite_code', (invite_code,))
+        if generation == cls._salt_cache_generation:
+            ttl = None if salt is not None else current_config.AUTH_SALT_NEGATIVE_TTL
+            _salt_cache.set(invite_code, salt, ttl=ttl)
+        return salt
+    
+    @classmethod
+    def invalidate_salt_cache(cls, *invite_codes):
+        """移除邀请码的盐值缓存（创建、修改、删除用户后调用）"""
+        cls._salt_cache_generation += 1
+        for invite_code in invite_codes:
+            if invite_code is not None:
+                _salt_cache.pop(invite_code)
     
     @classmethod
     def create(cls, username, password_hash, invite_code, salt=None):
@@ -118,6 +154,8 @@ class User:
         )
         
         success = Database.execute_query(query, params, commit=True)
+        # 该邀请码之前可能被负缓存；注册流程中create在外层事务内调用，需要等提交后再清除
+        Database.on_commit(lambda: cls.invalidate_salt_cache(invite_code))
         if success:
             return user_id
         return None
@@ -153,9 +191,13 @@ class User:
         if 'password' in update_data:
             new_password = update_data.pop('password')
             new_salt = cls.generate_salt()  # 使用现有的generate_salt方法
-            password_hash = cls.hash_password(new_password, new_salt)
+            # 前端派生登录哈希时使用固定的迭代次数，且获取盐值接口不返回迭代次数，
+            # 这里沿用用户当前的迭代次数，否则修改主密码后前端算出的哈希将无法匹配
+            iterations = existing_user.kdf_iterations
+            password_hash = cls.hash_password(new_password, new_salt, iterations)
             update_data['password_hash'] = password_hash
             update_data['salt'] = new_salt
+            update_data['kdf_iterations'] = iterations
         
         # 构建查询
         if not update_data:
@@ -167,7 +209,10 @@ class User:
         
         query = f'''UPDATE users SET {set_clause} WHERE id = ?'''
         
-        return Database.execute_query(query, params, commit=True)
+        result = Database.execute_query(query, params, commit=True)
+        new_invite_code = update_data.get('invite_code')
+        Database.on_commit(lambda: cls.invalidate_salt_cache(existing_user.invite_code, new_invite_code))
+        return result
     
     @classmethod
     def delete(cls, user_id):
@@ -179,21 +224,36 @@ class User:
         Returns:
             bool: 删除成功返回True，否则返回False
         """
-        # 先检查用户是否存在
-        existing_user = cls.get_by_id(user_id)
-        if not existing_user:
-            return False
-        
-        # 删除用户的密码数据
-        from models.password import Password
-        if hasattr(Password, 'delete_by_user_id'):
-            Password.delete_by_user_id(user_id)
-        
-        # 删除用户
-        query = '''DELETE FROM users WHERE id = ?'''
-        params = (user_id,)
-        
-        return Database.execute_query(query, params, commit=True)
+        # 检查、删除密码数据和删除用户在同一事务中完成，一次提交
+        with Database.transaction():
+            # 先检查用户是否存在
+            existing_user = cls.get_by_id(user_id)
+            if not existing_user:
+                return False
+            
+            # 删除用户的密码数据
+            from models.password import Password
+            if hasattr(Password, 'delete_by_user_id'):
+                Password.delete_by_user_id(user_id)
+                # 用户已不存在，墓碑不再需要
+                Password.delete_tombstones_by_user_id(user_id)
+            
+            # 删除用户的密码库修订号
+            from models.vault_revision import VaultRevision
+            VaultRevision.delete(user_id)
+            
+            # 删除用户的刷新令牌
+            from models.refresh_token import RefreshToken
+            RefreshToken.delete_by_user_id(user_id)
+            
+            # 删除用户
+            query = '''DELETE FROM users WHERE id = ?'''
+            params = (user_id,)
+            
+            result = Database.execute_query(query, params, commit=True)
+            # 事务提交后再清除缓存，避免并发请求在提交前把旧盐值写回缓存
+            Database.on_commit(lambda: cls.invalidate_salt_cache(existing_user.invite_code))
+            return result
     
     @classmethod
     def get_all(cls):
@@ -202,20 +262,32 @@ class User:
         Returns:
             list[User]: 用户列表
         """
-        query = '''SELECT * FROM users ORDER BY created_at DESC'''
-        rows = Database.execute_query(query)
-        
-        users = []
-        for row in rows:
-            user = cls(
-                id=row['id'],
-                username=row['username'],
-                password_hash=row['password_hash'],
-                salt=row['salt'],
-                invite_code=row['invite_code'],
-                created_at=row['created_at'],
-                updated_at=row['updated_at']
-            )
-            users.append(user)
-        
-        return users
+        return Database.fetch_all('users.list')
+
+
+# 行直接构造User对象
+Database.register(
+    'users.get_by_id',
+    f'SELECT {USER_COLUMNS} FROM users WHERE id = ?',
+    row_factory=model_row_factory(User)
+)
+Database.register(
+    'users.get_by_username',
+    f'SELECT {USER_COLUMNS} FROM users WHERE username = ?',
+    row_factory=model_row_factory(User)
+)
+Database.register(
+    'users.get_by_credentials',
+    f'SELECT {USER_COLUMNS} FROM users WHERE password_hash = ? AND invite_code = ?',
+    row_factory=model_row_factory(User)
+)
+Database.register(
+    'users.list',
+    f'SELECT {USER_COLUMNS} FROM users ORDER BY created_at DESC',
+    row_factory=model_row_factory(User)
+)
+Database.register(
+    'users.salt_by_invite_code',
+    'SELECT salt FROM users WHERE invite_code = ?',
+    row_factory=scalar_row_factory
+)
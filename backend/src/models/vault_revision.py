@@ -0,0 +1,45 @@
+from datetime import datetime
+from utils.db import Database, scalar_row_factory
+
+class VaultRevision:
+    """用户密码库的修订号
+    
+    每次密码库发生写入（创建、更新、删除）时修订号加一，
+    读接口用它生成ETag，客户端轮询时无需查询passwords表即可判断是否有变化
+    """
+    
+    @classmethod
+    def get(cls, user_id):
+        """获取用户密码库当前的修订号，从未写入过时返回0"""
+        revision = Database.fetch_one('vault_revisions.get', (user_id,))
+        return revision or 0
+    
+    @classmethod
+    def bump(cls, user_id):
+        """修订号加一并返回新的修订号
+        
+        应与对应的写操作在同一事务中调用，写操作回滚时修订号也一起回滚
+        """
+        with Database.transaction():
+            Database.execute('vault_revisions.bump', (user_id, datetime.now().isoformat()))
+            return Database.fetch_one('vault_revisions.get', (user_id,))
+    
+    @classmethod
+    def delete(cls, user_id):
+        """删除用户的修订号记录（删除用户时调用）"""
+        return Database.execute('vault_revisions.delete', (user_id,))
+
+
+Database.register(
+    'vault_revisions.get',
+    'SELECT revision FROM vault_revisions WHERE user_id = ?',
+    row_factory=scalar_row_factory
+)
+Database.register(
+    'vault_revisions.bump',
+    '''
+        INSERT INTO vault_revisions (user_id, revision, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT(user_id) DO UPDATE SET revision = revision + 1, updated_at = excluded.updated_at
+    '''
+)
+Database.register('vault_revisions.delete', 'DELETE FROM vault_revisions WHERE user_id = ?')
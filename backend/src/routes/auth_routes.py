@@ -1,15 +1,18 @@
 from flask import Blueprint
 from controllers.auth_controller import AuthController
 from middleware.auth_middleware import token_required
+from middleware.rate_limit import rate_limited
 
 # 创建认证蓝图
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 # 路由定义
-auth_bp.route('/master-password', methods=['POST'])(AuthController.authenticate_master_password)
-auth_bp.route('/salt', methods=['POST'])(AuthController.get_salt)
+auth_bp.route('/master-password', methods=['POST'])(rate_limited(AuthController.authenticate_master_password))
+auth_bp.route('/salt', methods=['POST'])(rate_limited(AuthController.get_salt))
+auth_bp.route('/refresh', methods=['POST'])(rate_limited(AuthController.refresh_token))
+auth_bp.route('/logout', methods=['POST'])(token_required(AuthController.logout))
 auth_bp.route('/verify-token', methods=['GET'])(AuthController.verify_token)
 auth_bp.route('/change-password', methods=['POST'])(AuthController.change_master_password)
 auth_bp.route('/check-user-exists', methods=['GET'])(AuthController.check_user_exists)
-auth_bp.route('/create-master-password', methods=['POST'])(AuthController.create_master_password)
+auth_bp.route('/create-master-password', methods=['POST'])(rate_limited(AuthController.create_master_password))
 
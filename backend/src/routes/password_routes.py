@@ -6,7 +6,13 @@ password_bp = Blueprint('password', __name__, url_prefix='/api/passwords')
 
 # 路由定义
 password_bp.route('/', methods=['GET'])(PasswordController.get_all_passwords)
+password_bp.route('/changes', methods=['GET'])(PasswordController.get_changes)
+password_bp.route('/categories', methods=['GET'])(PasswordController.get_categories)
+password_bp.route('/search', methods=['GET'])(PasswordController.search_passwords)
+password_bp.route('/export', methods=['GET'])(PasswordController.export_passwords)
 password_bp.route('/<string:password_id>', methods=['GET'])(PasswordController.get_password_by_id)
 password_bp.route('/', methods=['POST'])(PasswordController.create_password)
+password_bp.route('/batch', methods=['POST'])(PasswordController.batch_passwords)
+password_bp.route('/import', methods=['POST'])(PasswordController.import_passwords)
 password_bp.route('/<string:password_id>', methods=['PUT'])(PasswordController.update_password)
 password_bp.route('/<string:password_id>', methods=['DELETE'])(PasswordController.delete_password)
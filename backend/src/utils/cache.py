@@ -0,0 +1,88 @@
+"""
+进程内缓存工具
+线程安全的LRU缓存，可选过期时间，用于缓存按用户聚合的查询结果、令牌校验结果等
+"""
+import time
+import threading
+from collections import OrderedDict
+
+# 区分"未命中"和"缓存值为None"
+_MISSING = object()
+
+
+class LRUCache:
+    """线程安全的LRU缓存
+
+    超过maxsize时淘汰最久未使用的条目；设置ttl时条目在写入ttl秒后过期，
+    也可以在set时为单个条目指定过期时间
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        """初始化缓存
+
+        Args:
+            maxsize (int): 最多缓存的条目数
+            ttl (float, optional): 默认过期时间（秒），为None时不过期
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key, default=None):
+        """获取缓存值，不存在或已过期时返回default"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._data[key]
+            self._misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """写入缓存值
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl (float, optional): 该条目的过期时间（秒），默认使用缓存的ttl
+        """
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """删除并返回缓存值"""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """缓存统计信息，用于监控"""
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self._hits,
+                'misses': self._misses
+            }
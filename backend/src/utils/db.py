@@ -1,12 +1,20 @@
 import sqlite3
 import os
 import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+from functools import lru_cache
+from contextlib import contextmanager
 
 # 将当前目录添加到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.config import config
 from utils.log import Logger
+from utils.query_stats import QueryStats, normalize_sql, explain_query_plan
 
 # 初始化日志
 logger = Logger.get_logger('db')
@@ -17,102 +25,740 @@ current_config = config[os.getenv('FLASK_ENV', 'default')]
 # 确保数据目录存在
 os.makedirs(current_config.DATA_DIR, exist_ok=True)
 
+# 需要记录调试日志的语句类型
+LOGGED_QUERY_TYPES = frozenset(['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER'])
+
+# 写语句类型
+WRITE_QUERY_TYPES = frozenset(['INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER'])
+
+
+@lru_cache(maxsize=512)
+def get_query_type(query):
+    """解析SQL语句类型（SELECT/INSERT/...），结果按SQL文本缓存"""
+    return query.lstrip().split(None, 1)[0].upper()
+
+
+def dict_row_factory(keys):
+    """生成行工厂：按SELECT列的顺序把行直接映射成以keys为键的字典
+
+    跳过sqlite3.Row -> dict -> 模型对象 -> dict的多次复制，
+    keys可以直接使用接口输出的字段名（如camelCase）
+    """
+    keys = tuple(keys)
+
+    def factory(cursor, row):
+        return dict(zip(keys, row))
+    return factory
+
+
+def model_row_factory(model_cls):
+    """生成行工厂：按SELECT列的顺序把行直接作为位置参数构造模型对象"""
+    def factory(cursor, row):
+        return model_cls(*row)
+    return factory
+
+
+def scalar_row_factory(cursor, row):
+    """行工厂：只取第一列的值"""
+    return row[0]
+
+
+# 行工厂标记：直接返回原始元组，不做任何映射
+RAW_TUPLES = object()
+
+
+class Statement:
+    """预注册的命名SQL语句
+
+    语句类型等元数据只在注册时计算一次，执行时不再解析SQL
+    """
+    __slots__ = ('name', 'sql', 'query_type', 'is_write', 'row_factory', 'override_row_factory')
+
+    def __init__(self, name, sql, row_factory=None):
+        self.name = name
+        self.sql = sql
+        self.query_type = get_query_type(sql)
+        self.is_write = self.query_type in WRITE_QUERY_TYPES
+        # row_factory为None时使用连接默认的sqlite3.Row，为RAW_TUPLES时返回原始元组
+        self.override_row_factory = row_factory is not None
+        self.row_factory = None if row_factory is RAW_TUPLES else row_factory
+
+    def __repr__(self):
+        return f'<Statement {self.name} ({self.query_type})>'
+
+
+def open_connection(db_path):
+    """创建数据库连接并应用连接级配置"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    journal_mode = getattr(current_config, 'DB_JOURNAL_MODE', None)
+    if journal_mode:
+        # WAL模式下读操作不会被写操作阻塞
+        conn.execute(f'PRAGMA journal_mode={journal_mode}')
+    return conn
+
+
+class PoolTimeoutError(Exception):
+    """连接池在超时时间内无法提供连接"""
+    pass
+
+
+class PooledConnection:
+    """连接池中的连接代理
+
+    行为与sqlite3.Connection一致，区别在于close()不会真正关闭连接，
+    而是将其归还到连接池中以便复用
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._conn.__exit__(exc_type, exc_val, exc_tb)
+
+    @property
+    def raw(self):
+        """底层的sqlite3.Connection对象"""
+        return self._conn
+
+    def close(self):
+        """将连接归还到连接池"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """SQLite连接池
+
+    - 空闲连接按LIFO顺序复用，最近使用过的连接页缓存最热
+    - 最多保留pool_size个空闲连接，高峰期允许额外创建max_overflow个临时连接
+    - 连接空闲超过health_check_interval秒后，取出时先执行SELECT 1做健康检查
+    - 进程fork后自动丢弃从父进程继承的连接
+    """
+
+    def __init__(self, db_path, pool_size=5, max_overflow=10, timeout=5.0, health_check_interval=30.0):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._in_use = 0
+        self._closed = False
+        self._pid = os.getpid()
+
+    def _connect(self):
+        """创建新的数据库连接"""
+        conn = open_connection(self.db_path)
+        conn.row_factory = sqlite3.Row  # 使查询结果可以通过列名访问
+        return conn
+
+    def _check_fork(self):
+        """检测进程是否发生fork，fork后的子进程不能复用父进程的连接"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = queue.LifoQueue()
+            self._in_use = 0
+
+    def _is_healthy(self, conn):
+        """健康检查：连接能否正常执行简单查询"""
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """从连接池获取连接
+
+        Returns:
+            sqlite3.Connection: 可用的数据库连接
+
+        Raises:
+            PoolTimeoutError: 超时仍无可用连接
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._available:
+            self._check_fork()
+            if self._closed:
+                raise sqlite3.ProgrammingError('Connection pool has been shut down')
+            while True:
+                try:
+                    conn, idle_since = self._idle.get_nowait()
+                    self._in_use += 1
+                    break
+                except queue.Empty:
+                    pass
+                if self._in_use < self.pool_size + self.max_overflow:
+                    self._in_use += 1
+                    conn, idle_since = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f'No database connection available within {self.timeout}s '
+                        f'(pool_size={self.pool_size}, max_overflow={self.max_overflow})'
+                    )
+                self._available.wait(remaining)
+
+        # 建立连接和健康检查放在锁外执行，避免阻塞其他线程
+        try:
+            if conn is not None and time.monotonic() - idle_since > self.health_check_interval:
+                if not self._is_healthy(conn):
+                    logger.warning("连接池中的连接健康检查失败，重新建立连接")
+                    self._close_quietly(conn)
+                    conn = None
+            if conn is None:
+                conn = self._connect()
+            return conn
+        except Exception:
+            with self._available:
+                self._in_use -= 1
+                self._available.notify()
+            raise
+
+    def release(self, conn):
+        """将连接归还到连接池，未结束的事务会被回滚"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            reusable = True
+        except sqlite3.Error:
+            reusable = False
+
+        with self._available:
+            if self._pid != os.getpid():
+                # fork之前借出的连接，不归还到子进程的连接池
+                return
+            self._in_use = max(self._in_use - 1, 0)
+            if reusable and not self._closed and self._idle.qsize() < self.pool_size:
+                self._idle.put((conn, time.monotonic()))
+                conn = None
+            self._available.notify()
+
+        if conn is not None:
+            self._close_quietly(conn)
+
+    def close_all(self):
+        """关闭连接池中所有空闲连接，并拒绝后续的获取请求"""
+        with self._available:
+            self._closed = True
+            idle = []
+            while True:
+                try:
+                    idle.append(self._idle.get_nowait()[0])
+                except queue.Empty:
+                    break
+            self._available.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+        logger.info(f"连接池已关闭，释放{len(idle)}个空闲连接")
+
+    def stats(self):
+        """连接池状态，用于监控"""
+        with self._lock:
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'idle': self._idle.qsize(),
+                'in_use': self._in_use,
+                'closed': self._closed
+            }
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
 class Database:
+    _pool = None
+    _pool_lock = threading.Lock()
+    _writer = None
+    # 语句执行统计，未开启DB_QUERY_STATS_ENABLED时为None
+    _query_stats = QueryStats(
+        slow_query_ms=current_config.DB_SLOW_QUERY_MS,
+        slow_log_size=current_config.DB_SLOW_QUERY_LOG_SIZE
+    ) if current_config.DB_QUERY_STATS_ENABLED else None
+    # 线程本地状态：当前线程正在进行的事务连接和嵌套深度
+    _local = threading.local()
+
+    @classmethod
+    def get_pool(cls):
+        """获取全局连接池（首次使用时创建）"""
+        pool = cls._pool
+        if pool is None:
+            with cls._pool_lock:
+                if cls._pool is None:
+                    cls._pool = ConnectionPool(
+                        current_config.DB_PATH,
+                        pool_size=current_config.DB_POOL_SIZE,
+                        max_overflow=current_config.DB_POOL_MAX_OVERFLOW,
+                        timeout=current_config.DB_POOL_TIMEOUT,
+                        health_check_interval=current_config.DB_POOL_HEALTH_CHECK_INTERVAL
+                    )
+                    logger.info(f"数据库连接池创建完成，大小: {current_config.DB_POOL_SIZE}")
+                pool = cls._pool
+        return pool
+
+    @classmethod
+    def close_pool(cls):
+        """关闭全局连接池，应用退出时调用"""
+        with cls._pool_lock:
+            pool, cls._pool = cls._pool, None
+        if pool is not None:
+            pool.close_all()
+    
+    @classmethod
+    def get_writer(cls):
+        """获取单写线程写入队列，未开启DB_WRITE_QUEUE_ENABLED时返回None"""
+        if not current_config.DB_WRITE_QUEUE_ENABLED:
+            return None
+        writer = cls._writer
+        if writer is None:
+            with cls._pool_lock:
+                if cls._writer is None:
+                    from utils.write_queue import GroupCommitWriter
+                    cls._writer = GroupCommitWriter(
+                        cls._connect_writer,
+                        max_batch=current_config.DB_WRITE_QUEUE_MAX_BATCH,
+                        max_delay=current_config.DB_WRITE_QUEUE_MAX_DELAY,
+                        max_queue=current_config.DB_WRITE_QUEUE_MAX_SIZE
+                    )
+                    cls._writer.start()
+                writer = cls._writer
+        return writer
+    
     @staticmethod
-    def get_connection():
-        """获取数据库连接"""
-        conn = sqlite3.connect(current_config.DB_PATH)
-        conn.row_factory = sqlite3.Row  # 使查询结果可以通过列名访问
+    def _connect_writer():
+        """创建写线程专用连接，写事务中的查询和连接池连接一样按列名访问结果"""
+        conn = open_connection(current_config.DB_PATH)
+        conn.row_factory = sqlite3.Row
         return conn
     
+    @classmethod
+    def close_writer(cls):
+        """停止写线程，应用退出时调用，队列中的写请求会先执行完"""
+        with cls._pool_lock:
+            writer, cls._writer = cls._writer, None
+        if writer is not None:
+            writer.shutdown()
+    
+    @staticmethod
+    def _queued_writer():
+        """当前写操作可以使用的写入队列：处于事务中的写操作必须在事务连接上执行"""
+        if Database.in_transaction():
+            return None
+        return Database.get_writer()
+
+    @staticmethod
+    def get_connection():
+        """从连接池获取数据库连接，调用close()时归还到连接池"""
+        pool = Database.get_pool()
+        return PooledConnection(pool, pool.acquire())
+
+    @staticmethod
+    @contextmanager
+    def connection():
+        """以上下文管理器的方式借用连接，退出时自动归还
+        
+        当前线程处于事务中时，直接使用事务的连接
+        """
+        conn = getattr(Database._local, 'tx_conn', None)
+        if conn is not None:
+            yield conn
+            return
+        
+        pool = Database.get_pool()
+        conn = pool.acquire()
+        try:
+            yield conn
+        finally:
+            pool.release(conn)
+    
+    @staticmethod
+    def in_transaction():
+        """当前线程是否处于Database.transaction()中"""
+        return getattr(Database._local, 'tx_conn', None) is not None
+    
+    @staticmethod
+    def on_commit(callback):
+        """在当前事务提交后执行callback，不在事务中时立即执行
+        
+        用于清除进程内缓存等副作用：提交前清除的话，并发请求可能读到未提交前的旧数据并写回缓存。
+        内层保存点回滚时已登记的回调仍会执行，外层事务回滚时全部丢弃，因此回调应当是幂等的。
+        回调抛出的异常只记录日志，不影响已经提交的事务
+        """
+        if not Database.in_transaction():
+            callback()
+            return
+        Database._local.tx_on_commit.append(callback)
+    
+    @staticmethod
+    @contextmanager
+    def transaction(immediate=True):
+        """事务上下文管理器
+        
+        代码块内通过Database执行的所有语句（包括各模型方法）共用同一个连接，
+        正常退出时一次性提交，抛出异常时整体回滚。
+        嵌套调用会加入外层事务，内层使用SAVEPOINT，内层失败只回滚内层的修改。
+        开启DB_WRITE_QUEUE_ENABLED时，写事务（immediate=True）交给写线程，
+        在写线程的连接上执行并与同一批次的其他写请求一起提交
+        
+        Args:
+            immediate (bool): 是否在事务开始时立即获取写锁（BEGIN IMMEDIATE），
+                避免先读后写的事务在升级写锁时发生死锁，默认为True
+                
+        Yields:
+            sqlite3.Connection: 事务使用的连接
+        """
+        local = Database._local
+        conn = getattr(local, 'tx_conn', None)
+        
+        if conn is not None:
+            # 嵌套事务，使用保存点
+            local.tx_depth += 1
+            savepoint = f'sp_{local.tx_depth}'
+            conn.execute(f'SAVEPOINT {savepoint}')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f'ROLLBACK TO {savepoint}')
+                conn.execute(f'RELEASE {savepoint}')
+                raise
+            else:
+                conn.execute(f'RELEASE {savepoint}')
+            finally:
+                local.tx_depth -= 1
+            return
+        
+        writer = Database.get_writer() if immediate else None
+        if writer is not None:
+            with writer.transaction(current_config.DB_WRITE_QUEUE_TIMEOUT) as conn:
+                local.tx_conn = conn
+                local.tx_depth = 0
+                local.tx_on_commit = []
+                try:
+                    yield conn
+                finally:
+                    # 代码块结束后连接归还写线程，本线程不能再使用
+                    local.tx_conn = None
+        else:
+            pool = Database.get_pool()
+            conn = pool.acquire()
+            try:
+                conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+                local.tx_conn = conn
+                local.tx_depth = 0
+                local.tx_on_commit = []
+                try:
+                    yield conn
+                except BaseException:
+                    conn.rollback()
+                    raise
+                else:
+                    conn.commit()
+            finally:
+                local.tx_conn = None
+                pool.release(conn)
+        
+        # 提交成功后才执行，此时其他连接已经能读到新数据
+        callbacks, local.tx_on_commit = local.tx_on_commit, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"事务提交后的回调执行失败: {str(e)}")
+    
     @staticmethod
     def init_db():
-        """初始化数据库"""
-        conn = Database.get_connection()
+        """初始化数据库：执行所有未应用的迁移，把数据库升级到最新结构"""
+        from utils.migrations import migrate
+        
+        with Database.connection() as conn:
+            migrate(conn)
+    
+    # 已注册的命名语句
+    _statements = {}
+    
+    @staticmethod
+    def register(name, sql, row_factory=None):
+        """注册命名语句
+        
+        Args:
+            name (str): 语句名称，如'passwords.get_by_id'
+            sql (str): SQL语句
+            row_factory (callable, optional): 行工厂，签名为(cursor, row)，默认返回sqlite3.Row，
+                传入RAW_TUPLES时返回原始元组
+            
+        Returns:
+            Statement: 注册的语句对象
+        """
+        statement = Statement(name, sql, row_factory)
+        Database._statements[name] = statement
+        return statement
+    
+    @staticmethod
+    def statement(name):
+        """根据名称获取已注册的语句"""
+        try:
+            return Database._statements[name]
+        except KeyError:
+            raise KeyError(f'Unknown statement: {name}') from None
+    
+    @staticmethod
+    def _record(key, sql, query_type, params, started, rows, conn=None, error=False):
+        """记录语句耗时，超过慢查询阈值时记录执行计划并输出警告日志"""
+        stats = Database._query_stats
+        if stats is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if stats.record(key, elapsed_ms, rows, error) and not error:
+            plan = None
+            if conn is not None and current_config.DB_SLOW_QUERY_EXPLAIN:
+                plan = explain_query_plan(conn, sql, params, query_type)
+            stats.record_slow_query(key, sql, elapsed_ms, rows, plan)
+            logger.warning("慢查询 %s 耗时%.1fms，行数%d，执行计划: %s", key, elapsed_ms, rows, plan)
+    
+    @staticmethod
+    def get_query_stats():
+        """导出各语句的执行统计（次数、耗时分位数、直方图、行数），按总耗时排序
+        
+        命名语句以语句名称为键，execute_query执行的语句以规范化后的SQL为键
+        """
+        stats = Database._query_stats
+        return stats.snapshot() if stats is not None else {}
+    
+    @staticmethod
+    def get_slow_queries():
+        """导出最近的慢查询记录，包含执行计划"""
+        stats = Database._query_stats
+        return stats.slow_queries() if stats is not None else []
+    
+    @staticmethod
+    def reset_query_stats():
+        """清空语句执行统计"""
+        if Database._query_stats is not None:
+            Database._query_stats.reset()
+    
+    @staticmethod
+    def _run(conn, statement, params):
+        """在给定连接上执行语句并返回游标，不提交"""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("执行%s语句: %s", statement.query_type, statement.name)
         cursor = conn.cursor()
+        if statement.override_row_factory:
+            cursor.row_factory = statement.row_factory
+        try:
+            cursor.execute(statement.sql, params)
+        except Exception as e:
+            cursor.close()
+            logger.error("数据库语句%s执行失败: %s", statement.name, e)
+            raise
+        return cursor
+    
+    @staticmethod
+    def fetch_all(name, params=()):
+        """执行命名查询语句，返回经过行工厂映射的全部结果"""
+        statement = Database.statement(name)
+        started = time.perf_counter()
+        with Database.connection() as conn:
+            try:
+                cursor = Database._run(conn, statement, params)
+                try:
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+            except Exception:
+                Database._record(statement.name, statement.sql, statement.query_type, params, started, 0, error=True)
+                raise
+            Database._record(statement.name, statement.sql, statement.query_type, params, started, len(rows), conn)
+            return rows
+    
+    @staticmethod
+    def fetch_one(name, params=()):
+        """执行命名查询语句，返回第一行结果，没有结果时返回None"""
+        statement = Database.statement(name)
+        started = time.perf_counter()
+        with Database.connection() as conn:
+            try:
+                cursor = Database._run(conn, statement, params)
+                try:
+                    row = cursor.fetchone()
+                finally:
+                    cursor.close()
+            except Exception:
+                Database._record(statement.name, statement.sql, statement.query_type, params, started, 0, error=True)
+                raise
+            Database._record(statement.name, statement.sql, statement.query_type, params, started, 0 if row is None else 1, conn)
+            return row
+    
+    @staticmethod
+    def iter_rows(name, params=(), batch_size=500):
+        """执行命名查询语句，按批次逐行返回结果的生成器
         
-        # 创建密码表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS passwords (
-                id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                title TEXT NOT NULL,
-                username TEXT NOT NULL,
-                password TEXT NOT NULL,
-                url TEXT,
-                category TEXT NOT NULL,
-                notes TEXT,
-                platform TEXT,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
-        # 创建邀请码表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invite_codes (
-                id TEXT PRIMARY KEY,
-                code TEXT NOT NULL UNIQUE,
-                status TEXT NOT NULL DEFAULT 'active',
-                expires_at TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        ''')
-        
-        # 创建用户表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id TEXT PRIMARY KEY,
-                username TEXT NOT NULL,
-                password_hash TEXT NOT NULL,
-                salt TEXT NOT NULL,
-                invite_code TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY (invite_code) REFERENCES invite_codes(code)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+        结果不会一次性全部载入内存，适合导出等大结果集。
+        生成器在迭代期间一直占用一个连接，迭代结束或生成器被关闭时归还
+        """
+        statement = Database.statement(name)
+        started = time.perf_counter()
+        rows = 0
+        with Database.connection() as conn:
+            try:
+                cursor = Database._run(conn, statement, params)
+            except Exception:
+                Database._record(statement.name, statement.sql, statement.query_type, params, started, 0, error=True)
+                raise
+            try:
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    rows += len(batch)
+                    yield from batch
+            finally:
+                cursor.close()
+            # 耗时包含调用方处理每批数据的时间，慢查询不记录执行计划
+            Database._record(statement.name, statement.sql, statement.query_type, params, started, rows)
+    
+    @staticmethod
+    def execute(name, params=()):
+        """执行命名写语句并提交，处于事务中时由事务统一提交
+        
+        Returns:
+            int: 受影响的行数
+        """
+        statement = Database.statement(name)
+        started = time.perf_counter()
+        writer = Database._queued_writer()
+        if writer is not None:
+            rowcount = writer.execute(statement.sql, params, timeout=current_config.DB_WRITE_QUEUE_TIMEOUT)
+            Database._record(statement.name, statement.sql, statement.query_type, params, started, rowcount)
+            return rowcount
+        
+        # 处于事务中时由事务统一提交或回滚
+        joined = Database.in_transaction()
+        with Database.connection() as conn:
+            try:
+                cursor = Database._run(conn, statement, params)
+                rowcount = cursor.rowcount
+                cursor.close()
+                if not joined:
+                    conn.commit()
+            except Exception:
+                if not joined:
+                    conn.rollback()
+                Database._record(statement.name, statement.sql, statement.query_type, params, started, 0, error=True)
+                raise
+            Database._record(statement.name, statement.sql, statement.query_type, params, started, rowcount, conn)
+            return rowcount
+    
+    @staticmethod
+    def execute_many(name, seq_of_params):
+        """对一组参数批量执行命名写语句（executemany）并提交，处于事务中时由事务统一提交
+        
+        Returns:
+            int: 受影响的总行数
+        """
+        statement = Database.statement(name)
+        started = time.perf_counter()
+        writer = Database._queued_writer()
+        if writer is not None:
+            rowcount = writer.execute(statement.sql, seq_of_params, many=True, timeout=current_config.DB_WRITE_QUEUE_TIMEOUT)
+            Database._record(statement.name, statement.sql, statement.query_type, None, started, rowcount)
+            return rowcount
+        
+        joined = Database.in_transaction()
+        with Database.connection() as conn:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("批量执行%s语句: %s", statement.query_type, statement.name)
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(statement.sql, seq_of_params)
+                rowcount = cursor.rowcount
+                if not joined:
+                    conn.commit()
+            except Exception as e:
+                if not joined:
+                    conn.rollback()
+                logger.error("数据库语句%s批量执行失败: %s", statement.name, e)
+                Database._record(statement.name, statement.sql, statement.query_type, None, started, 0, error=True)
+                raise
+            finally:
+                cursor.close()
+            # executemany的参数可能是生成器，慢查询不记录执行计划
+            Database._record(statement.name, statement.sql, statement.query_type, None, started, rowcount)
+            return rowcount
     
     @staticmethod
     def execute_query(query, params=None, commit=False):
-        """执行查询"""
-        conn = Database.get_connection()
-        cursor = conn.cursor()
+        """执行查询，处于事务中时由事务统一提交"""
+        query_type = get_query_type(query)
+        started = time.perf_counter()
         
-        try:
-            # 记录查询信息（隐藏敏感信息）
-            query_type = query.strip().split()[0].upper()
-            if query_type in ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER']:
-                logger.debug(f"执行{query_type}查询")
-                logger.debug(f"查询SQL: {query}")
-                if params:
-                    logger.debug(f"查询参数: {params}")
-            
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            if commit:
-                conn.commit()
-                logger.info(f"{query_type}查询执行成功并提交")
+        if commit:
+            writer = Database._queued_writer()
+            if writer is not None:
+                rowcount = writer.execute(query, params or (), timeout=current_config.DB_WRITE_QUEUE_TIMEOUT)
+                Database._record(normalize_sql(query), query, query_type, params, started, rowcount)
                 return True
-            else:
-                results = cursor.fetchall()
-                logger.debug(f"{query_type}查询返回{len(results)}条记录")
-                # 将sqlite3.Row对象转换为字典
-                return [dict(row) for row in results]
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"数据库查询执行失败: {str(e)}")
-            logger.error(f"失败的SQL: {query}")
-            if params:
-                logger.error(f"失败的参数: {params}")
-            raise e
-        finally:
-            conn.close()
+        
+        # 处于事务中时由事务统一提交或回滚
+        joined = Database.in_transaction()
+        
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # 记录查询信息（隐藏敏感信息），未开启DEBUG时不格式化日志
+                if logger.isEnabledFor(logging.DEBUG) and query_type in LOGGED_QUERY_TYPES:
+                    logger.debug("执行%s查询", query_type)
+                    logger.debug("查询SQL: %s", query)
+                    if params:
+                        logger.debug("查询参数: %s", params)
+                
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                
+                if commit:
+                    if not joined:
+                        conn.commit()
+                    logger.debug("%s查询执行成功并提交", query_type)
+                    Database._record(normalize_sql(query), query, query_type, params, started, cursor.rowcount, conn)
+                    return True
+                else:
+                    results = cursor.fetchall()
+                    logger.debug("%s查询返回%d条记录", query_type, len(results))
+                    Database._record(normalize_sql(query), query, query_type, params, started, len(results), conn)
+                    # 将sqlite3.Row对象转换为字典
+                    return [dict(row) for row in results]
+            except Exception as e:
+                if not joined:
+                    conn.rollback()
+                Database._record(normalize_sql(query), query, query_type, params, started, 0, error=True)
+                logger.error(f"数据库查询执行失败: {str(e)}")
+                logger.error(f"失败的SQL: {query}")
+                if params:
+                    logger.error(f"失败的参数: {params}")
+                raise e
+            finally:
+                cursor.close()
+
+
+# 应用退出时关闭连接池和写线程（atexit按注册的逆序执行，先停写线程）
+atexit.register(Database.close_pool)
+atexit.register(Database.close_writer)
@@ -0,0 +1,60 @@
+"""
+HTTP条件请求工具
+根据密码库修订号生成ETag，处理If-None-Match并返回304 Not Modified；
+解析If-Match中的记录版本号，用于写请求的乐观并发控制
+"""
+import zlib
+from flask import request, current_app
+
+
+def make_etag(user_id, revision, *parts):
+    """生成弱ETag的值（不含引号）
+
+    修订号只在用户内部递增，把用户ID和其他区分参数（路径、查询参数等）
+    的校验和拼接进去，避免不同用户或不同视图的响应使用相同的ETag
+    """
+    checksum = zlib.crc32(user_id.encode('utf-8'))
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        checksum = zlib.crc32(part, checksum)
+    return f'r{revision}-{checksum:08x}'
+
+
+def is_not_modified(etag):
+    """请求的If-None-Match是否与ETag匹配（弱比较）"""
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified_response(etag):
+    """构造304 Not Modified响应"""
+    response = current_app.response_class(status=304)
+    return with_etag(response, etag)
+
+
+def with_etag(response, etag):
+    """为响应设置ETag，并要求客户端每次使用前重新验证"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def get_if_match_version():
+    """解析If-Match请求头中的记录版本号（强ETag，如 "3"）
+
+    Returns:
+        int: 期望的版本号，未提供If-Match或为*时返回None
+
+    Raises:
+        ValueError: If-Match不是单个强ETag形式的版本号
+    """
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    tags = if_match.as_set()
+    if len(tags) != 1:
+        raise ValueError('If-Match must contain exactly one record version')
+    version = int(tags.pop())
+    if version < 1:
+        raise ValueError('Record version must be a positive integer')
+    return version
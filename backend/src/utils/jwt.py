@@ -1,8 +1,11 @@
 import jwt
+import uuid
+import threading
 from datetime import datetime, timedelta
 from config.config import config
 import os
 from utils.log import Logger
+from utils.jwt_keys import ASYMMETRIC_ALGORITHMS, JWTKeySet, get_unverified_kid
 
 # 初始化日志
 logger = Logger.get_logger('jwt')
@@ -10,20 +13,76 @@ logger = Logger.get_logger('jwt')
 # 获取配置
 current_config = config[os.getenv('FLASK_ENV', 'default')]
 
+# 支持的签名算法，HS256使用共享的SECRET_KEY
+SUPPORTED_ALGORITHMS = ('HS256',) + ASYMMETRIC_ALGORITHMS
+
+_key_set = None
+_key_set_lock = threading.Lock()
+# 公钥下线或替换时的回调
+_key_removed_listeners = []
+
+
+def add_key_removed_listener(callback):
+    """注册公钥下线或替换时的回调（如清除令牌验证缓存）"""
+    _key_removed_listeners.append(callback)
+
+
+def validate_jwt_config():
+    """启动时校验JWT签名配置
+
+    JWT_ALGORITHM拼写错误或不受支持时直接报错，而不是悄悄退回HS256；
+    RS256/EdDSA模式同时检查cryptography是否已安装
+
+    Raises:
+        ValueError: JWT_ALGORITHM不受支持
+        RuntimeError: RS256/EdDSA模式缺少cryptography
+    """
+    algorithm = current_config.JWT_ALGORITHM
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        raise ValueError(
+            f'Unsupported JWT_ALGORITHM: {algorithm!r}, expected one of {", ".join(SUPPORTED_ALGORITHMS)}'
+        )
+    if algorithm in ASYMMETRIC_ALGORITHMS:
+        get_key_set()
+
+
+def get_key_set():
+    """获取RS256/EdDSA模式的密钥集，首次调用时创建"""
+    global _key_set
+    if _key_set is None:
+        with _key_set_lock:
+            if _key_set is None:
+                _key_set = JWTKeySet(
+                    current_config.JWT_KEY_DIR,
+                    current_config.JWT_ALGORITHM,
+                    current_config.JWT_KEY_RELOAD_INTERVAL,
+                    on_keys_removed=_key_removed_listeners
+                )
+    return _key_set
+
+
 class JWTUtil:
     @staticmethod
     def generate_token(user_id, username, ip_address=None):
         """生成JWT令牌"""
         payload = {
+            'jti': uuid.uuid4().hex,  # 令牌唯一标识，用于撤销单个令牌
             'user_id': user_id,
             'username': username,
             'ip_address': ip_address,
-            'exp': datetime.utcnow() + timedelta(minutes=30),  # 令牌有效期30分钟
+            'exp': datetime.utcnow() + timedelta(minutes=current_config.ACCESS_TOKEN_EXPIRE_MINUTES),
             'iat': datetime.utcnow()
         }
         
         try:
-            token = jwt.encode(payload, current_config.SECRET_KEY, algorithm='HS256')
+            algorithm = current_config.JWT_ALGORITHM
+            if algorithm in ASYMMETRIC_ALGORITHMS:
+                kid, key = get_key_set().signing_key()
+                token = jwt.encode(payload, key, algorithm=algorithm, headers={'kid': kid})
+            elif algorithm == 'HS256':
+                token = jwt.encode(payload, current_config.SECRET_KEY, algorithm='HS256')
+            else:
+                raise ValueError(f'Unsupported JWT_ALGORITHM: {algorithm!r}')
             logger.info(f"为用户{username}生成JWT令牌")
             logger.debug(f"JWT令牌生成 - 用户ID: {user_id}, IP地址: {ip_address}")
             return token
@@ -35,14 +94,28 @@ class JWTUtil:
     def verify_token(token):
         """验证JWT令牌"""
         try:
-            payload = jwt.decode(token, current_config.SECRET_KEY, algorithms=['HS256'])
-            logger.info(f"JWT令牌验证成功 - 用户: {payload['username']}")
+            algorithm = current_config.JWT_ALGORITHM
+            if algorithm in ASYMMETRIC_ALGORITHMS:
+                # 按kid选择公钥，算法固定为配置值，不信任令牌头部的alg
+                key = get_key_set().verification_key(get_unverified_kid(token))
+                if key is None:
+                    logger.warning("JWT令牌的kid未知或密钥已下线")
+                    return {'valid': False, 'error': 'Invalid token'}
+            elif algorithm == 'HS256':
+                key = current_config.SECRET_KEY
+            else:
+                raise ValueError(f'Unsupported JWT_ALGORITHM: {algorithm!r}')
+            payload = jwt.decode(token, key, algorithms=[algorithm])
+            logger.debug(f"JWT令牌验证成功 - 用户: {payload['username']}")
             logger.debug(f"JWT令牌内容 - 用户ID: {payload['user_id']}, IP地址: {payload.get('ip_address')}")
             return {
                 'valid': True,
                 'user_id': payload['user_id'],
                 'username': payload['username'],
-                'ip_address': payload.get('ip_address')
+                'ip_address': payload.get('ip_address'),
+                'jti': payload.get('jti'),
+                'iat': payload.get('iat', 0),
+                'exp': payload['exp']
             }
         except jwt.ExpiredSignatureError:
             logger.warning("JWT令牌已过期")
@@ -0,0 +1,223 @@
+"""
+JWT非对称签名密钥集
+RS256/EdDSA模式下，签发节点用私钥签名、令牌头部带kid，验证节点只需要公钥，
+不再共享签名密钥。密钥目录结构：
+    <kid>.key.pem  私钥（PKCS8），只放在签发节点
+    <kid>.pub.pem  公钥，所有节点都需要
+    active         当前用于签名的kid，不存在时使用kid最大（最新）的私钥
+
+轮换时先把新公钥分发到所有节点，再切换active；旧私钥可以立即删除，
+旧公钥保留到旧令牌全部过期（一个访问令牌有效期）后再删除，期间新旧令牌都能验证通过
+"""
+import os
+import time
+import threading
+import jwt
+from jwt.algorithms import get_default_algorithms, has_crypto
+from utils.log import Logger
+
+# 初始化日志
+logger = Logger.get_logger('jwt_keys')
+
+# 支持的非对称签名算法
+ASYMMETRIC_ALGORITHMS = ('RS256', 'EdDSA')
+
+PRIVATE_KEY_SUFFIX = '.key.pem'
+PUBLIC_KEY_SUFFIX = '.pub.pem'
+ACTIVE_FILE = 'active'
+
+# 遇到未知kid时强制重新扫描目录的最小间隔（秒），避免伪造的kid反复触发扫描
+MIN_FORCED_RELOAD_INTERVAL = 1.0
+
+
+class JWTKeySet:
+    """从本地目录加载的JWT签名/验证密钥集
+
+    解析后的密钥按kid缓存，只有文件修改时间变化时才重新解析；
+    每隔reload_interval秒重新扫描一次目录，新增或删除的密钥无需重启即可生效
+    """
+
+    def __init__(self, key_dir, algorithm, reload_interval=60.0, on_keys_removed=None):
+        """初始化密钥集
+
+        Args:
+            key_dir (str): 密钥目录
+            algorithm (str): 签名算法，RS256或EdDSA
+            reload_interval (float): 重新扫描目录的间隔（秒）
+            on_keys_removed (list, optional): 回调函数列表，公钥被删除或替换时调用，
+                用于清除基于旧公钥的验证结果缓存
+        """
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f'Unsupported JWT algorithm: {algorithm}')
+        if not has_crypto:
+            raise RuntimeError(f'{algorithm} requires the cryptography package')
+
+        self.key_dir = key_dir
+        self.algorithm = algorithm
+        self.reload_interval = reload_interval
+        self._algorithm = get_default_algorithms()[algorithm]
+        self._lock = threading.Lock()
+        # {kid: (文件修改时间, 解析后的密钥)}
+        self._public_keys = {}
+        self._private_keys = {}
+        self._active_kid = None
+        self._next_reload = 0.0
+        self._last_reload = 0.0
+        self._on_keys_removed = on_keys_removed if on_keys_removed is not None else []
+
+    def signing_key(self):
+        """获取当前签名密钥
+
+        Returns:
+            tuple: (kid, 私钥)
+
+        Raises:
+            RuntimeError: 本节点没有可用的私钥（只做验证的节点）
+        """
+        self._reload_if_due()
+        with self._lock:
+            kid = self._active_kid
+            entry = self._private_keys.get(kid) if kid is not None else None
+        if entry is None:
+            raise RuntimeError(f'No JWT signing key available in {self.key_dir}')
+        return kid, entry[1]
+
+    def verification_key(self, kid):
+        """根据kid获取验证公钥，未知kid时返回None"""
+        self._reload_if_due()
+        entry = self._public_keys.get(kid)
+        if entry is None and time.monotonic() - self._last_reload >= MIN_FORCED_RELOAD_INTERVAL:
+            # 新密钥可能刚分发到本节点，立即重新扫描一次
+            self.reload()
+            entry = self._public_keys.get(kid)
+        return entry[1] if entry is not None else None
+
+    def kids(self):
+        """当前可用于验证的kid列表"""
+        self._reload_if_due()
+        return sorted(self._public_keys)
+
+    def _reload_if_due(self):
+        if time.monotonic() >= self._next_reload:
+            self.reload()
+
+    def reload(self):
+        """重新扫描密钥目录"""
+        with self._lock:
+            try:
+                names = os.listdir(self.key_dir)
+            except FileNotFoundError:
+                names = []
+
+            old_public_keys = self._public_keys
+            self._public_keys = self._load_keys(names, PUBLIC_KEY_SUFFIX, old_public_keys)
+            self._private_keys = self._load_keys(names, PRIVATE_KEY_SUFFIX, self._private_keys)
+            self._active_kid = self._read_active_kid()
+
+            self._last_reload = time.monotonic()
+            self._next_reload = self._last_reload + self.reload_interval
+
+            # 被删除或文件内容变化的公钥，之前用它验证通过的令牌不应再被放行
+            removed = [
+                kid for kid, entry in old_public_keys.items()
+                if self._public_keys.get(kid, (None,))[0] != entry[0]
+            ]
+
+        if removed:
+            logger.info(f"JWT公钥已下线或替换: {', '.join(removed)}")
+            for callback in self._on_keys_removed:
+                callback()
+
+    def _load_keys(self, names, suffix, cached):
+        """加载目录中指定后缀的密钥，文件未变化时沿用已解析的密钥"""
+        keys = {}
+        for name in names:
+            if not name.endswith(suffix):
+                continue
+            kid = name[:-len(suffix)]
+            path = os.path.join(self.key_dir, name)
+            try:
+                mtime = os.stat(path).st_mtime
+                entry = cached.get(kid)
+                if entry is None or entry[0] != mtime:
+                    with open(path, 'rb') as f:
+                        entry = (mtime, self._algorithm.prepare_key(f.read()))
+                    logger.info(f"已加载JWT密钥: {name}")
+                keys[kid] = entry
+            except Exception as e:
+                # 单个密钥文件损坏不影响其他密钥
+                logger.error(f"加载JWT密钥{name}失败: {str(e)}")
+        return keys
+
+    def _read_active_kid(self):
+        """读取当前签名kid"""
+        try:
+            with open(os.path.join(self.key_dir, ACTIVE_FILE), 'r', encoding='utf-8') as f:
+                kid = f.read().strip()
+            if kid in self._private_keys:
+                return kid
+            if self._private_keys:
+                logger.error(f"active指定的JWT密钥{kid}不存在，改用最新的私钥")
+        except FileNotFoundError:
+            pass
+        return max(self._private_keys) if self._private_keys else None
+
+
+def generate_key_pair(key_dir, algorithm, activate=False):
+    """生成新的密钥对并写入密钥目录（管理脚本使用）
+
+    Args:
+        key_dir (str): 密钥目录
+        algorithm (str): RS256或EdDSA
+        activate (bool): 是否立即用于签名
+
+    Returns:
+        str: 新密钥的kid
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    if algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == 'EdDSA':
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f'Unsupported JWT algorithm: {algorithm}')
+
+    # kid按时间排序，未指定active时自动使用最新的密钥
+    kid = time.strftime('%Y%m%d%H%M%S') + '-' + os.urandom(3).hex()
+    os.makedirs(key_dir, exist_ok=True)
+
+    private_path = os.path.join(key_dir, kid + PRIVATE_KEY_SUFFIX)
+    fd = os.open(private_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+    with open(os.path.join(key_dir, kid + PUBLIC_KEY_SUFFIX), 'wb') as f:
+        f.write(private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        ))
+
+    if activate:
+        activate_key(key_dir, kid)
+    return kid
+
+
+def activate_key(key_dir, kid):
+    """切换签名密钥（管理脚本使用）"""
+    if not os.path.exists(os.path.join(key_dir, kid + PRIVATE_KEY_SUFFIX)):
+        raise ValueError(f'Private key not found: {kid}')
+    # 先写临时文件再替换，避免其他进程读到半个kid
+    tmp_path = os.path.join(key_dir, ACTIVE_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(kid)
+    os.replace(tmp_path, os.path.join(key_dir, ACTIVE_FILE))
+
+
+def get_unverified_kid(token):
+    """读取令牌头部的kid（未验证签名）"""
+    return jwt.get_unverified_header(token).get('kid')
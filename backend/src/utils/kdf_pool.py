@@ -0,0 +1,120 @@
+"""
+密钥派生（PBKDF2）工作线程池
+PBKDF2计算量大，放到容量有限的专用线程池中执行，避免突发的改密请求占满请求线程。
+hashlib.pbkdf2_hmac在计算期间会释放GIL，线程池即可利用多核，无需进程池。
+排队的任务数达到上限时立即拒绝，由接口返回503让客户端稍后重试
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# 将当前目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import config
+from utils.hash import pbkdf2_hash
+from utils.log import Logger
+
+# 初始化日志
+logger = Logger.get_logger('kdf_pool')
+
+# 获取当前配置
+current_config = config[os.getenv('FLASK_ENV', 'default')]
+
+
+class KdfPoolBusyError(Exception):
+    """密钥派生线程池已满或等待结果超时，调用方应稍后重试"""
+
+    def __init__(self, retry_after):
+        super().__init__('Key derivation pool is busy')
+        self.retry_after = retry_after
+
+
+class KdfPool:
+    """容量有限的密钥派生线程池
+
+    - 最多max_workers个任务同时计算
+    - 包括正在计算的任务在内最多max_pending个任务，超出时立即抛出KdfPoolBusyError
+    """
+
+    def __init__(self, max_workers=2, max_pending=8, timeout=10.0, retry_after=1):
+        """初始化线程池
+
+        Args:
+            max_workers (int): 同时计算的任务数
+            max_pending (int): 最多容纳的任务数（计算中 + 排队中）
+            timeout (float): 等待单个任务结果的最长时间（秒）
+            retry_after (int): 拒绝时建议客户端重试的间隔（秒）
+        """
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kdf')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._stats = {'completed': 0, 'rejected': 0, 'timeouts': 0}
+
+    def run(self, fn, *args, **kwargs):
+        """在线程池中执行fn并等待结果
+
+        Raises:
+            KdfPoolBusyError: 线程池已满，或等待超过timeout秒
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            logger.warning("密钥派生线程池已满，拒绝请求")
+            raise KdfPoolBusyError(self.retry_after)
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        # 任务完成（而不是调用方等待结束）时才释放名额，超时的任务仍然占用名额
+        future.add_done_callback(self._release)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            logger.warning(f"等待密钥派生结果超过{self.timeout}秒")
+            raise KdfPoolBusyError(self.retry_after)
+
+    def pbkdf2_hash(self, password, salt, iterations, key_length):
+        """在线程池中计算PBKDF2哈希，参数与utils.hash.pbkdf2_hash一致"""
+        return self.run(pbkdf2_hash, password, salt, iterations=iterations, key_length=key_length)
+
+    def _release(self, future):
+        self._slots.release()
+        with self._lock:
+            self._stats['completed'] += 1
+
+    def stats(self):
+        """线程池统计信息，用于监控"""
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self, wait=True):
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_kdf_pool():
+    """获取全局密钥派生线程池，首次调用时按配置创建"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = KdfPool(
+                    max_workers=current_config.KDF_POOL_WORKERS,
+                    max_pending=current_config.KDF_POOL_MAX_PENDING,
+                    timeout=current_config.KDF_POOL_TIMEOUT,
+                    retry_after=current_config.KDF_RETRY_AFTER_SECONDS
+                )
+    return _pool
@@ -0,0 +1,345 @@
+"""
+数据库迁移模块
+按版本号顺序执行迁移步骤，已执行的版本记录在schema_version表中，
+应用启动时自动将已有数据库升级到最新结构
+"""
+import os
+import sys
+import sqlite3
+from datetime import datetime
+
+# 将当前目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.log import Logger
+
+# 初始化日志
+logger = Logger.get_logger('migrations')
+
+
+class Migration:
+    """单个迁移步骤
+
+    steps中的每一项可以是SQL字符串，也可以是接收连接对象的函数。
+    所有步骤都必须是幂等的（如CREATE ... IF NOT EXISTS），
+    这样即使迁移中途失败重跑，也不会破坏数据库
+    """
+
+    def __init__(self, version, name, steps):
+        self.version = version
+        self.name = name
+        self.steps = steps
+
+    def apply(self, conn):
+        """在给定连接上执行迁移步骤"""
+        for step in self.steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+
+
+def create_password_search_index(conn):
+    """创建密码元数据的FTS5全文索引及同步触发器
+
+    使用外部内容表，索引只保存分词结果，正文仍从passwords表读取。
+    user_id也建入索引，查询时先在索引内限定用户，不受其他用户数据量影响。
+    SQLite未编译FTS5时跳过，搜索接口退回到LIKE查询，之后每次启动由
+    ensure_password_search_index重新尝试
+
+    Returns:
+        bool: 索引是否已创建
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS passwords_fts USING fts5(
+                user_id, title, username, url, platform, category,
+                content='passwords', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning(f"SQLite不支持FTS5，跳过创建搜索索引: {str(e)}")
+        return False
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_insert AFTER INSERT ON passwords BEGIN
+            INSERT INTO passwords_fts (rowid, user_id, title, username, url, platform, category)
+            VALUES (new.rowid, new.user_id, new.title, new.username, new.url, new.platform, new.category);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_delete AFTER DELETE ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, user_id, title, username, url, platform, category)
+            VALUES ('delete', old.rowid, old.user_id, old.title, old.username, old.url, old.platform, old.category);
+        END
+    ''')
+    # 只有索引列变化时才更新索引，修改密码、备注不会触发
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_update
+        AFTER UPDATE OF title, username, url, platform, category ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, user_id, title, username, url, platform, category)
+            VALUES ('delete', old.rowid, old.user_id, old.title, old.username, old.url, old.platform, old.category);
+            INSERT INTO passwords_fts (rowid, user_id, title, username, url, platform, category)
+            VALUES (new.rowid, new.user_id, new.title, new.username, new.url, new.platform, new.category);
+        END
+    ''')
+    # 为已有数据建立索引。passwords表没有INTEGER PRIMARY KEY，VACUUM可能改变rowid，
+    # 执行VACUUM后需要同样执行一次rebuild
+    conn.execute("INSERT INTO passwords_fts (passwords_fts) VALUES ('rebuild')")
+    return True
+
+
+def ensure_password_search_index(conn):
+    """搜索索引不存在时补建
+
+    迁移6在SQLite不支持FTS5时会跳过建索引但仍记为已执行，
+    升级到支持FTS5的SQLite后由这里创建索引并为已有数据建立索引
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'passwords_fts'"
+    ).fetchone()
+    if exists:
+        return
+
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        if create_password_search_index(conn):
+            logger.info("已补建密码搜索索引")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"补建密码搜索索引失败: {str(e)}")
+        raise
+
+
+def column_exists(conn, table, column):
+    """检查表中是否已存在指定列"""
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def add_column(table, column, definition):
+    """生成幂等的添加列步骤，列已存在时跳过"""
+    def step(conn):
+        if not column_exists(conn, table, column):
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return step
+
+
+# 迁移列表，版本号必须严格递增，已发布的迁移不允许再修改
+MIGRATIONS = [
+    Migration(1, 'create_base_tables', [
+        # 密码表
+        '''
+            CREATE TABLE IF NOT EXISTS passwords (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                username TEXT NOT NULL,
+                password TEXT NOT NULL,
+                url TEXT,
+                category TEXT NOT NULL,
+                notes TEXT,
+                platform TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''',
+        # 邀请码表
+        '''
+            CREATE TABLE IF NOT EXISTS invite_codes (
+                id TEXT PRIMARY KEY,
+                code TEXT NOT NULL UNIQUE,
+                status TEXT NOT NULL DEFAULT 'active',
+                expires_at TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''',
+        # 用户表
+        '''
+            CREATE TABLE IF NOT EXISTS users (
+                id TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                password_hash TEXT NOT NULL,
+                salt TEXT NOT NULL,
+                invite_code TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY (invite_code) REFERENCES invite_codes(code)
+            )
+        '''
+    ]),
+    Migration(2, 'add_lookup_indexes', [
+        # 密码列表（Password.get_page / get_all_json）: WHERE user_id = ? ORDER BY category, title
+        'CREATE INDEX IF NOT EXISTS idx_passwords_user_category_title ON passwords(user_id, category, title)',
+        # 登录: WHERE password_hash = ? AND invite_code = ?；获取盐值: SELECT salt ... WHERE invite_code = ?（覆盖索引）
+        'CREATE INDEX IF NOT EXISTS idx_users_invite_code_hash_salt ON users(invite_code, password_hash, salt)',
+        # InviteCode.get_available_codes / get_by_status / cleanup_expired: WHERE status = ? [AND expires_at < ?]
+        'CREATE INDEX IF NOT EXISTS idx_invite_codes_status_expires ON invite_codes(status, expires_at)'
+    ]),
+    Migration(3, 'add_password_keyset_index', [
+        # 键集分页按(category, title, id)排序和定位，id需要在索引中才能完全走索引
+        'CREATE INDEX IF NOT EXISTS idx_passwords_user_category_title_id ON passwords(user_id, category, title, id)',
+        'DROP INDEX IF EXISTS idx_passwords_user_category_title'
+    ]),
+    Migration(4, 'create_vault_revisions', [
+        # 每个用户密码库的修订号，用于条件GET（ETag）
+        '''
+            CREATE TABLE IF NOT EXISTS vault_revisions (
+                user_id TEXT PRIMARY KEY,
+                revision INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        '''
+    ]),
+    Migration(5, 'add_password_revisions_and_tombstones', [
+        # 每条密码记录最后一次写入时的密码库修订号，用于增量同步
+        add_column('passwords', 'revision', 'INTEGER NOT NULL DEFAULT 0'),
+        # 已有数据：有密码的用户修订号加一，已有记录都归入这个修订号，
+        # 这样since=0的增量同步能拿到全部已有记录
+        lambda conn: conn.execute('''
+            INSERT INTO vault_revisions (user_id, revision, updated_at)
+            SELECT DISTINCT user_id, 1, ? FROM passwords WHERE revision = 0
+            ON CONFLICT(user_id) DO UPDATE SET revision = revision + 1, updated_at = excluded.updated_at
+        ''', (datetime.now().isoformat(),)),
+        '''
+            UPDATE passwords SET revision = (
+                SELECT revision FROM vault_revisions WHERE vault_revisions.user_id = passwords.user_id
+            ) WHERE revision = 0
+        ''',
+        # 增量同步: WHERE user_id = ? AND revision > ?
+        'CREATE INDEX IF NOT EXISTS idx_passwords_user_revision ON passwords(user_id, revision)',
+        # 已删除密码的墓碑记录，客户端据此删除本地副本
+        '''
+            CREATE TABLE IF NOT EXISTS password_tombstones (
+                id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                revision INTEGER NOT NULL,
+                deleted_at TEXT NOT NULL,
+                PRIMARY KEY (user_id, id)
+            )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_password_tombstones_user_revision ON password_tombstones(user_id, revision)'
+    ]),
+    Migration(6, 'create_password_search_index', [
+        create_password_search_index
+    ]),
+    Migration(7, 'add_password_versions', [
+        # 记录版本号，每次更新加一，用于乐观并发控制（If-Match）
+        add_column('passwords', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    ]),
+    Migration(8, 'create_refresh_tokens', [
+        # 刷新令牌，只保存令牌的SHA-256摘要；同一次登录轮换出的令牌属于同一个family
+        '''
+            CREATE TABLE IF NOT EXISTS refresh_tokens (
+                token_hash TEXT PRIMARY KEY,
+                family_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                ip_address TEXT,
+                expires_at TEXT NOT NULL,
+                session_expires_at TEXT NOT NULL,
+                used_at TEXT,
+                revoked_at TEXT,
+                created_at TEXT NOT NULL
+            )
+        ''',
+        # 检测到重用时撤销整个family
+        'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens(family_id)',
+        # 按用户清理过期令牌、删除用户时删除令牌
+        'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user_expires ON refresh_tokens(user_id, expires_at)'
+    ]),
+    Migration(9, 'add_user_kdf_iterations', [
+        # 每个用户主密码哈希使用的PBKDF2迭代次数，已有用户沿用原来的10000次
+        add_column('users', 'kdf_iterations', 'INTEGER NOT NULL DEFAULT 10000')
+    ]),
+    Migration(10, 'create_token_revocations', [
+        # 访问令牌撤销记录，只追加，各进程按seq增量同步到内存。
+        # jti不为空时撤销单个令牌；jti为空时撤销该用户在issued_before及之前签发的所有令牌。
+        # expires_at之后相关令牌都已自然过期，记录可以删除
+        '''
+            CREATE TABLE IF NOT EXISTS token_revocations (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                jti TEXT,
+                user_id TEXT NOT NULL,
+                issued_before INTEGER,
+                expires_at INTEGER NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_token_revocations_expires ON token_revocations(expires_at)'
+    ]),
+]
+
+
+def get_schema_version(conn):
+    """获取数据库当前的结构版本，未执行过迁移时返回0"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    conn.commit()
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, migrations=None):
+    """将数据库升级到最新版本
+
+    每个迁移在独立的事务中执行，迁移和版本记录一起提交，
+    失败时回滚该迁移并抛出异常，已成功的迁移保持不变
+
+    Args:
+        conn: 数据库连接
+        migrations (list[Migration], optional): 迁移列表，默认为MIGRATIONS
+
+    Returns:
+        list[int]: 本次执行的迁移版本号
+    """
+    if migrations is None:
+        migrations = MIGRATIONS
+    migrations = sorted(migrations, key=lambda m: m.version)
+    current_version = get_schema_version(conn)
+    applied = []
+
+    for migration in migrations:
+        if migration.version <= current_version:
+            continue
+
+        logger.info(f"执行数据库迁移 {migration.version}: {migration.name}")
+        try:
+            # 加写锁，防止多个进程同时启动时重复执行同一迁移
+            conn.execute('BEGIN IMMEDIATE')
+            # 拿到写锁后重新确认版本，其他进程可能已经完成了该迁移
+            already_applied = conn.execute(
+                'SELECT 1 FROM schema_version WHERE version = ?', (migration.version,)
+            ).fetchone()
+            if not already_applied:
+                migration.apply(conn)
+                conn.execute(
+                    'INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                    (migration.version, migration.name, datetime.now().isoformat())
+                )
+            conn.commit()
+            applied.append(migration.version)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"数据库迁移 {migration.version} 执行失败: {str(e)}")
+            raise
+
+    # 迁移6可能因当时不支持FTS5而跳过了建索引，之后每次启动都检查一次
+    if current_version >= 6:
+        ensure_password_search_index(conn)
+
+    if applied:
+        # 新建索引后更新查询优化器的统计信息
+        conn.execute('PRAGMA optimize')
+        logger.info(f"数据库迁移完成，当前版本: {applied[-1]}")
+    else:
+        logger.info(f"数据库已是最新版本: {current_version}")
+
+    return applied
@@ -0,0 +1,41 @@
+"""
+NDJSON（每行一个JSON对象）读取工具
+从请求体流中逐行解析，不把整个请求体读入内存
+"""
+import json
+
+
+def iter_ndjson(stream, max_line_bytes):
+    """逐行解析NDJSON流
+
+    空行会被跳过；超长行、非UTF-8行、无效JSON行不会中断解析，
+    以错误的形式返回，由调用方决定如何处理
+
+    Args:
+        stream: 二进制流，如request.stream
+        max_line_bytes (int): 单行的最大字节数
+
+    Yields:
+        tuple: (行号, 解析结果, 错误信息)，解析成功时错误信息为None，失败时解析结果为None
+    """
+    line_number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            break
+        line_number += 1
+
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # 跳过这一行剩余的部分
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            yield line_number, None, f'Line exceeds {max_line_bytes} bytes'
+            continue
+
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line.decode('utf-8')), None
+        except (UnicodeDecodeError, ValueError):
+            yield line_number, None, 'Invalid JSON'
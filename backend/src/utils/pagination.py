@@ -0,0 +1,50 @@
+"""
+键集分页工具
+游标是排序键的不透明编码，客户端只能原样传回，不应解析其内容
+"""
+import json
+import base64
+import binascii
+
+
+class InvalidCursorError(ValueError):
+    """游标格式无效"""
+    pass
+
+
+def encode_cursor(values):
+    """把排序键编码为URL安全的游标字符串"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor, size):
+    """解码游标，返回长度为size的排序键列表
+
+    Raises:
+        InvalidCursorError: 游标无法解码或排序键数量不符
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError, binascii.Error):
+        raise InvalidCursorError('Invalid cursor') from None
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError('Invalid cursor')
+    if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+        raise InvalidCursorError('Invalid cursor')
+    return values
+
+
+def parse_limit(value, default, maximum):
+    """解析分页大小参数，限制在[1, maximum]范围内
+
+    Raises:
+        ValueError: 参数不是正整数
+    """
+    if value is None or value == '':
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, maximum)
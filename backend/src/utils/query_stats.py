@@ -0,0 +1,150 @@
+"""
+SQL语句执行统计模块
+按语句记录执行次数、耗时直方图和返回/影响的行数，
+超过阈值的慢查询记录执行计划，供监控接口或命令行工具导出
+"""
+import re
+import threading
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+# 直方图桶的上界（毫秒），最后一个桶收集所有更慢的语句
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# 支持EXPLAIN QUERY PLAN的语句类型
+EXPLAINABLE_QUERY_TYPES = frozenset(['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH'])
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=512)
+def normalize_sql(sql):
+    """把SQL中的连续空白压缩为一个空格，作为未命名语句的统计键"""
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class StatementStats:
+    """单条语句的统计数据"""
+    __slots__ = ('count', 'errors', 'total_ms', 'max_ms', 'rows', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def percentile(self, fraction):
+        """根据直方图估算分位数，返回所在桶的上界（毫秒）"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target:
+                if index < len(LATENCY_BUCKETS_MS):
+                    return min(LATENCY_BUCKETS_MS[index], self.max_ms)
+                return self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        """转换为字典格式"""
+        histogram = {f'le_{bound}ms': count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)}
+        histogram['gt_{}ms'.format(LATENCY_BUCKETS_MS[-1])] = self.buckets[-1]
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'rows': self.rows,
+            'totalMs': round(self.total_ms, 3),
+            'avgMs': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'maxMs': round(self.max_ms, 3),
+            'p50Ms': round(self.percentile(0.50), 3),
+            'p95Ms': round(self.percentile(0.95), 3),
+            'p99Ms': round(self.percentile(0.99), 3),
+            'histogram': histogram
+        }
+
+
+class QueryStats:
+    """线程安全的语句统计收集器"""
+
+    def __init__(self, slow_query_ms=100, slow_log_size=100):
+        self.slow_query_ms = slow_query_ms
+        self._stats = {}
+        self._slow_queries = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+
+    def record(self, key, elapsed_ms, rows=0, error=False):
+        """记录一次语句执行
+
+        Args:
+            key (str): 语句名称或规范化后的SQL
+            elapsed_ms (float): 执行耗时（毫秒）
+            rows (int): 返回或影响的行数
+            error (bool): 是否执行失败
+
+        Returns:
+            bool: 是否为慢查询
+        """
+        bucket = bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats()
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+            if rows and rows > 0:
+                stats.rows += rows
+            if error:
+                stats.errors += 1
+            stats.buckets[bucket] += 1
+        return elapsed_ms >= self.slow_query_ms
+
+    def record_slow_query(self, key, sql, elapsed_ms, rows, plan):
+        """记录慢查询及其执行计划"""
+        entry = {
+            'statement': key,
+            'sql': normalize_sql(sql),
+            'elapsedMs': round(elapsed_ms, 3),
+            'rows': rows,
+            'plan': plan,
+            'at': datetime.now().isoformat()
+        }
+        with self._lock:
+            self._slow_queries.append(entry)
+        return entry
+
+    def snapshot(self):
+        """导出所有语句的聚合统计，按总耗时从高到低排序"""
+        with self._lock:
+            items = [(key, stats.to_dict()) for key, stats in self._stats.items()]
+        items.sort(key=lambda item: item[1]['totalMs'], reverse=True)
+        return dict(items)
+
+    def slow_queries(self):
+        """导出最近的慢查询记录（最新的在后）"""
+        with self._lock:
+            return list(self._slow_queries)
+
+    def reset(self):
+        """清空统计数据"""
+        with self._lock:
+            self._stats.clear()
+            self._slow_queries.clear()
+
+
+def explain_query_plan(conn, sql, params, query_type):
+    """获取语句的执行计划，不支持或失败时返回None"""
+    if query_type not in EXPLAINABLE_QUERY_TYPES:
+        return None
+    try:
+        rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params or ()).fetchall()
+        return [row[3] for row in rows]
+    except Exception:
+        return None
@@ -0,0 +1,162 @@
+"""
+令牌桶限流
+每个键（如客户端IP、邀请码）一个桶，桶中最多burst个令牌，每秒补充rate个，
+每个请求消耗一个令牌，桶空时拒绝并返回需要等待的秒数。
+- MemoryTokenBucket：状态保存在进程内，开销为微秒级，适合单进程部署
+- SQLiteTokenBucket：状态保存在独立的SQLite文件中，多个进程共享同一组桶，
+  不占用业务数据库的写锁
+"""
+import os
+import time
+import sqlite3
+import threading
+from utils.cache import LRUCache
+from utils.log import Logger
+
+# 初始化日志
+logger = Logger.get_logger('rate_limit')
+
+
+class MemoryTokenBucket:
+    """进程内令牌桶"""
+
+    def __init__(self, name, rate, burst, maxsize=100000):
+        """初始化令牌桶
+
+        Args:
+            name (str): 限流器名称，用于日志
+            rate (float): 每秒补充的令牌数
+            burst (int): 桶容量，即允许的突发请求数
+            maxsize (int): 最多记录的键数，超出时淘汰最久未使用的桶（相当于重新装满）
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        # 桶在最后一次请求burst/rate秒后必然已装满，和不存在等价，可以直接过期
+        self._buckets = LRUCache(maxsize, ttl=burst / rate)
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """尝试消耗一个令牌
+
+        Returns:
+            float: 0表示允许，否则为需要等待的秒数
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= 1:
+                self._buckets.set(key, (tokens - 1, now))
+                return 0
+            self._buckets.set(key, (tokens, now))
+        return (1 - tokens) / self.rate
+
+
+class SQLiteTokenBucket:
+    """多进程共享的令牌桶，状态保存在SQLite文件中
+
+    补充和消耗令牌在一条UPSERT语句中完成，多个进程并发请求同一个键时不会超发；
+    数据库出错时放行请求，限流故障不影响正常登录
+    """
+
+    CLEANUP_INTERVAL = 60.0
+
+    def __init__(self, name, rate, burst, db_path):
+        """初始化令牌桶
+
+        Args:
+            name (str): 限流器名称，不同限流器的桶互不影响
+            rate (float): 每秒补充的令牌数
+            burst (int): 桶容量
+            db_path (str): 状态数据库文件路径
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.db_path = db_path
+        self._local = threading.local()
+        self._next_cleanup = 0.0
+
+    def _connection(self):
+        """每个线程使用自己的连接，自动提交模式"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # 限流状态丢失无关紧要，不需要等待落盘
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    scope TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (scope, key)
+                ) WITHOUT ROWID
+            ''')
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key):
+        """尝试消耗一个令牌
+
+        Returns:
+            float: 0表示允许，否则为需要等待的秒数
+        """
+        # 多进程共享状态，只能使用墙钟时间
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute('''
+                INSERT INTO rate_limit_buckets (scope, key, tokens, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(scope, key) DO UPDATE SET
+                    tokens = MIN(?, tokens + MAX(excluded.updated_at - updated_at, 0) * ?) - 1,
+                    updated_at = excluded.updated_at
+                WHERE MIN(?, tokens + MAX(excluded.updated_at - updated_at, 0) * ?) >= 1
+                RETURNING tokens
+            ''', (self.name, key, self.burst - 1, now, self.burst, self.rate, self.burst, self.rate)).fetchone()
+            if now >= self._next_cleanup:
+                self._cleanup(conn, now)
+            if row is not None:
+                return 0
+
+            # 桶已空（未更新），计算还需要等待多久
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE scope = ? AND key = ?',
+                (self.name, key)
+            ).fetchone()
+            if row is None:
+                return 0
+            tokens = min(self.burst, row[0] + max(now - row[1], 0) * self.rate)
+            return max((1 - tokens) / self.rate, 0)
+        except sqlite3.Error as e:
+            logger.error(f"限流状态数据库访问失败，放行请求: {str(e)}")
+            return 0
+
+    def _cleanup(self, conn, now):
+        """删除已经装满的桶"""
+        self._next_cleanup = now + self.CLEANUP_INTERVAL
+        conn.execute(
+            'DELETE FROM rate_limit_buckets WHERE scope = ? AND updated_at < ?',
+            (self.name, now - self.burst / self.rate)
+        )
+
+
+def create_token_bucket(name, rate, burst, backend='memory', db_path=None, maxsize=100000):
+    """按配置创建令牌桶
+
+    Args:
+        name (str): 限流器名称
+        rate (float): 每秒补充的令牌数
+        burst (int): 桶容量
+        backend (str): memory或sqlite
+        db_path (str, optional): sqlite后端的状态数据库文件路径
+        maxsize (int): memory后端最多记录的键数
+    """
+    if backend == 'sqlite':
+        return SQLiteTokenBucket(name, rate, burst, db_path)
+    if backend == 'memory':
+        return MemoryTokenBucket(name, rate, burst, maxsize)
+    raise ValueError(f'Unsupported rate limit backend: {backend}')
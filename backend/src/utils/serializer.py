@@ -0,0 +1,40 @@
+"""
+JSON序列化工具
+直接把数据库返回的元组行写成JSON，跳过逐行构造字典/模型对象再交给jsonify的过程
+"""
+import json
+from json.encoder import encode_basestring_ascii
+
+
+def encode_value(value):
+    """把单个字段值编码为JSON文本"""
+    if value.__class__ is str:
+        return encode_basestring_ascii(value)
+    if value is None:
+        return 'null'
+    return json.dumps(value)
+
+
+class RowSerializer:
+    """按固定字段顺序把元组行序列化为JSON对象
+
+    字段名的JSON编码只在构造时计算一次，序列化每行时只编码字段值
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._prefixes = tuple(
+            ('{' if index == 0 else ',') + encode_basestring_ascii(field) + ':'
+            for index, field in enumerate(self.fields)
+        )
+
+    def dumps_row(self, row):
+        """序列化单行，row的列顺序必须与fields一致"""
+        parts = [prefix + encode_value(value) for prefix, value in zip(self._prefixes, row)]
+        parts.append('}')
+        return ''.join(parts)
+
+    def dumps_rows(self, rows):
+        """序列化多行为JSON数组"""
+        dumps_row = self.dumps_row
+        return '[' + ','.join([dumps_row(row) for row in rows]) + ']'
@@ -0,0 +1,339 @@
+"""
+单写线程写入队列
+所有写语句和写事务通过队列交给专用的写线程执行，写线程把一个时间窗口内到达的写请求
+合并到同一个事务中提交（group commit），调用方通过Future获取结果。
+多个请求线程不再争抢SQLite的写锁，一次fsync可以提交多条写入
+"""
+import os
+import sys
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+# 将当前目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.log import Logger
+
+# 初始化日志
+logger = Logger.get_logger('write_queue')
+
+# 通知写线程退出的哨兵
+_STOP = object()
+
+
+class WriteQueueBusyError(Exception):
+    """写入队列繁忙，调用方应稍后重试"""
+    pass
+
+
+class WriteQueueFullError(WriteQueueBusyError):
+    """写入队列已满"""
+    pass
+
+
+class WriteQueueTimeoutError(WriteQueueBusyError):
+    """写请求在超时时间内没有开始执行，已从队列中取消，不会再被提交"""
+    pass
+
+
+class WriteQueueClosedError(Exception):
+    """写线程已退出，请求没有执行"""
+    pass
+
+
+class WriteRequest:
+    """一次写请求"""
+    __slots__ = ('sql', 'params', 'many', 'future')
+
+    def __init__(self, sql, params, many):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.future = Future()
+
+
+class TransactionRequest:
+    """一次写事务：写线程在该请求的SAVEPOINT中把连接借给调用方线程执行整段代码"""
+    __slots__ = ('future', 'ready', 'finished', 'failed', 'conn')
+
+    def __init__(self):
+        self.future = Future()
+        # 写线程已建立保存点，调用方可以开始使用连接
+        self.ready = threading.Event()
+        # 调用方的代码块已执行完，failed表示需要回滚到保存点
+        self.finished = threading.Event()
+        self.failed = False
+        self.conn = None
+
+
+class GroupCommitWriter:
+    """单写线程，按批次合并提交写请求
+
+    - 写线程取到第一个请求后，最多再等待max_delay秒收集后续请求，
+      批次达到max_batch条时立即提交
+    - 每个请求在独立的SAVEPOINT中执行，单个请求失败只回滚它自己，
+      不影响同一批次的其他请求
+    - 写事务（transaction()）同样占用批次中的一个SAVEPOINT，写线程在此期间把连接借给
+      调用方线程执行整段代码，同一时刻只有一个调用方使用连接
+    - Future在事务提交成功之后才完成，调用方拿到结果时数据已经落盘
+    - 等待超时的请求如果还没开始执行会被取消，不会在调用方收到错误之后再被提交；
+      写线程退出时，队列中尚未完成的请求全部以异常结束
+    """
+
+    def __init__(self, connect, max_batch=64, max_delay=0.002, max_queue=10000, put_timeout=5.0):
+        """初始化写线程
+
+        Args:
+            connect (callable): 创建写线程专用连接的函数
+            max_batch (int): 每个事务最多合并的写请求数
+            max_delay (float): 收集同一批次请求的最长等待时间（秒）
+            max_queue (int): 队列中最多等待的写请求数
+            put_timeout (float): 队列已满时提交请求的最长等待时间（秒）
+        """
+        self._connect = connect
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'batches': 0, 'requests': 0, 'failed': 0, 'cancelled': 0}
+
+    def start(self):
+        """启动写线程"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+                logger.info("数据库写线程已启动")
+
+    def submit(self, sql, params=(), many=False):
+        """提交写请求
+
+        Args:
+            sql (str): 写语句
+            params: 语句参数；many为True时为参数序列
+            many (bool): 是否使用executemany执行
+
+        Returns:
+            Future: 完成时的结果为受影响的行数
+
+        Raises:
+            WriteQueueFullError: 队列在put_timeout秒内一直是满的
+        """
+        if many:
+            # executemany的参数可能是生成器，需要在调用方线程中物化
+            params = list(params)
+        request = WriteRequest(sql, params, many)
+        self._put(request)
+        return request.future
+
+    def execute(self, sql, params=(), many=False, timeout=None):
+        """提交写请求并等待提交完成
+
+        Returns:
+            int: 受影响的行数
+
+        Raises:
+            WriteQueueFullError: 队列已满
+            WriteQueueTimeoutError: timeout秒内请求没有开始执行，已取消
+        """
+        future = self.submit(sql, params, many)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            self._cancel(future)
+            # 取消失败说明请求已经在执行，所在批次很快就会提交
+            return future.result()
+
+    @contextmanager
+    def transaction(self, timeout=None):
+        """借用写线程的连接执行一段写事务
+
+        代码块在调用方线程中执行，期间写线程等待，代码块内的语句都在该请求的SAVEPOINT中；
+        正常退出时等待所在批次提交后才返回，抛出异常时回滚到保存点
+
+        Args:
+            timeout (float, optional): 等待轮到该请求的最长时间（秒）
+
+        Yields:
+            sqlite3.Connection: 写线程的连接
+
+        Raises:
+            WriteQueueFullError: 队列已满
+            WriteQueueTimeoutError: timeout秒内没有轮到该请求，已取消
+        """
+        request = TransactionRequest()
+        self._put(request)
+        if not request.ready.wait(timeout):
+            self._cancel(request.future)
+            request.ready.wait()
+        if request.future.done():
+            # 轮到该请求之前批次已经失败，或者写线程已退出
+            request.future.result()
+
+        try:
+            yield request.conn
+        except BaseException:
+            request.failed = True
+            request.finished.set()
+            raise
+        request.finished.set()
+        request.future.result()
+
+    def _put(self, request):
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        try:
+            self._queue.put(request, timeout=self.put_timeout)
+        except queue.Full:
+            raise WriteQueueFullError('Database write queue is full') from None
+
+    def _cancel(self, future):
+        """取消还没开始执行的请求，取消成功时抛出WriteQueueTimeoutError"""
+        if future.cancel():
+            with self._lock:
+                self._stats['cancelled'] += 1
+            logger.warning("数据库写请求等待超时，已取消")
+            raise WriteQueueTimeoutError('Database write request timed out in queue')
+
+    def shutdown(self, wait=True):
+        """停止写线程，队列中已提交的请求会先执行完"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            if wait:
+                thread.join()
+            logger.info("数据库写线程已停止")
+
+    def stats(self):
+        """写线程统计信息，用于监控"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _run(self):
+        conn = None
+        batch = []
+        error = None
+        try:
+            conn = self._connect()
+            stopping = False
+            while not stopping:
+                batch = []
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+
+                batch = [first]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                self._commit_batch(conn, batch)
+                batch = []
+        except BaseException as e:
+            logger.exception(f"数据库写线程异常退出: {str(e)}")
+            error = e
+        finally:
+            if conn is not None:
+                conn.close()
+            # 正在处理的批次和队列中剩余的请求都不会再执行，让等待的调用方立即收到异常
+            if error is None:
+                error = WriteQueueClosedError('Database writer has stopped')
+            pending = list(batch)
+            while True:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is not _STOP:
+                    pending.append(request)
+            self._fail(pending, error)
+
+    @staticmethod
+    def _fail(requests, error):
+        """以异常结束尚未完成的请求"""
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(error)
+            if isinstance(request, TransactionRequest):
+                request.ready.set()
+
+    def _commit_batch(self, conn, batch):
+        """在一个事务中执行一批写请求并提交"""
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for request in batch:
+                # 已被调用方取消（等待超时）的请求不再执行
+                if not request.future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT write_request')
+                if isinstance(request, TransactionRequest):
+                    request.conn = conn
+                    request.ready.set()
+                    request.finished.wait()
+                    if request.failed:
+                        conn.execute('ROLLBACK TO write_request')
+                    conn.execute('RELEASE write_request')
+                    outcomes.append((request, None, None))
+                    continue
+                try:
+                    if request.many:
+                        cursor = conn.executemany(request.sql, request.params)
+                    else:
+                        cursor = conn.execute(request.sql, request.params)
+                    outcomes.append((request, cursor.rowcount, None))
+                    conn.execute('RELEASE write_request')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_request')
+                    conn.execute('RELEASE write_request')
+                    outcomes.append((request, None, e))
+            conn.commit()
+        except Exception as e:
+            # 提交失败，整个批次都没有生效
+            logger.error(f"数据库批量提交失败: {str(e)}")
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            self._fail(batch, e)
+            with self._lock:
+                self._stats['batches'] += 1
+                self._stats['requests'] += len(batch)
+                self._stats['failed'] += len(batch)
+            return
+
+        failed = 0
+        for request, rowcount, error in outcomes:
+            if isinstance(request, TransactionRequest) and request.failed:
+                # 调用方已经拿到自己代码块抛出的异常
+                failed += 1
+                request.future.set_result(None)
+            elif error is None:
+                request.future.set_result(rowcount)
+            else:
+                failed += 1
+                logger.error(f"数据库写请求执行失败: {str(error)}")
+                request.future.set_exception(error)
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['requests'] += len(batch)
+            self._stats['failed'] += failed